@@ -1,18 +1,9 @@
+import time
 import streamlit as st
-from poseperfect_ai.preprocessing.image_preprocessor import preprocess_for_static_analysis
-from poseperfect_ai.analysis.static_analyzer import (
-    calculate_v_taper_ratio, 
-    get_v_taper_score,
-    analyze_muscularity,
-    analyze_conditioning,
-    calculate_total_package_score
-)
-from poseperfect_ai.analysis.dynamic_analyzer import (
-    deconstruct_routine,
-    analyze_stability,
-    analyze_stage_presence,
-    analyze_flow
-)
+from poseperfect_ai.analysis.job_queue import DONE, FAILED, CANCELLED, QueueFullError, get_job_queue
+from poseperfect_ai.analysis.dynamic_analyzer import analyze_stage_presence
+from poseperfect_ai.preprocessing.image_preprocessor import DEFAULT_QUALITY, QUALITY_PRESETS
+from poseperfect_ai.utils.resources import get_resource_manager
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -21,64 +12,165 @@ st.set_page_config(
     layout="wide"
 )
 
-# --- Analysis Functions ---
-
-def run_static_analysis(image_bytes, division, pose):
-    """Contains the full logic to run the static analysis and render the results."""
-    with st.spinner("Performing full analysis..."):
-        annotated_image, pose_landmarks = preprocess_for_static_analysis(image_bytes)
-        st.success("Preprocessing Complete!")
-
-        if pose_landmarks:
-            height, width, _ = annotated_image.shape
-            v_taper_ratio = calculate_v_taper_ratio(pose_landmarks, width, height)
-            v_taper_score = get_v_taper_score(v_taper_ratio)
-            muscularity_results = analyze_muscularity(annotated_image)
-            muscularity_score = muscularity_results["Overall Fullness"]
-            conditioning_results = analyze_conditioning(annotated_image)
-            conditioning_score = conditioning_results["Overall Conditioning"]
-            total_score = calculate_total_package_score(v_taper_score, muscularity_score, conditioning_score)
-
-            st.header("Judge's Report Card")
-            tab1, tab2, tab3 = st.tabs(["🏆 Dashboard", "📊 Diagnostics", "🧠 Coaching"])
-
-            with tab1:
-                st.subheader(f"Total Package Score: {total_score}")
-                st.progress(total_score)
-                st.info("This score represents the complete package, balancing symmetry, muscularity, and conditioning.")
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric(label="Symmetry (V-Taper)", value=v_taper_score)
-                with col2:
-                    st.metric(label="Muscularity", value=muscularity_score, help="Placeholder score")
-                with col3:
-                    st.metric(label="Conditioning", value=conditioning_score, help="Placeholder score")
-
-            with tab2:
-                st.subheader("Diagnostic Breakdown")
-                img_col, data_col = st.columns([2,3])
-                with img_col:
-                    st.image(annotated_image, caption="Preprocessed image with landmarks.", use_column_width=True)
-                with data_col:
-                    st.write("**V-Taper Details:**")
-                    st.text(f"Shoulder-to-Waist Ratio: {v_taper_ratio:.2f}")
-                    st.write("--- ")
-                    st.write("**Muscularity Details (Placeholder):**")
-                    st.json(muscularity_results)
-                    st.write("--- ")
-                    st.write("**Conditioning Details (Placeholder):**")
-                    st.json(conditioning_results)
-
-            with tab3:
-                st.subheader("AI-Generated Coaching")
-                st.write("Based on your scores, here are the key areas to focus on:")
-                if v_taper_score < 80:
-                    st.warning(f"**V-Taper (Score: {v_taper_score}):** Your shoulder-to-waist ratio is the primary area for improvement.")
-                else:
-                    st.success(f"**V-Taper (Score: {v_taper_score}):** Your V-Taper is a dominant strong point!")
-                st.info("More detailed coaching will be available when the Anatomist Module is fully trained.")
-        else:
-            st.error("Could not detect a pose in the image. Please try a different photo.")
+# --- Analysis Workers ---
+
+# Inference runs in worker processes shared by every session, so the script only
+# submits jobs and polls them. The workers start now and load their models in the
+# background, so the first analysis is not the slowest.
+job_queue = get_job_queue(warm_up_models=True)
+
+POLL_INTERVAL_SECONDS = 0.5
+
+def submit_job(state_key, submit):
+    """Submits a job and remembers its ID in the session, replacing any earlier job."""
+    previous_job_id = st.session_state.pop(state_key, None)
+    if previous_job_id:
+        job_queue.cancel(previous_job_id)
+    try:
+        st.session_state[state_key] = submit()
+    except QueueFullError:
+        st.error("The server is busy with other analyses. Please try again in a moment.")
+
+def track_job(state_key):
+    """
+    Shows the progress (or failure) of the job stored in the session and returns
+    its status, or None if there is no job.
+    """
+    job_id = st.session_state.get(state_key)
+    if job_id is None:
+        return None
+    status = job_queue.status(job_id)
+    if status is None:
+        del st.session_state[state_key]
+        st.warning("These results have expired. Please run the analysis again.")
+        return None
+
+    if status.state == FAILED:
+        st.error(f"Analysis failed: {status.error}")
+    elif status.state == CANCELLED:
+        st.info("Analysis cancelled.")
+    elif not status.finished:
+        progress_col, cancel_col = st.columns([5, 1])
+        with progress_col:
+            st.progress(int(status.progress * 100), text=status.message)
+        with cancel_col:
+            if st.button("Cancel", key=f"cancel_{state_key}"):
+                job_queue.cancel(job_id)
+    return status
+
+def rerun_while_running(*statuses):
+    """Polls unfinished jobs by rerunning the script after a short pause."""
+    if any(status is not None and not status.finished for status in statuses):
+        time.sleep(POLL_INTERVAL_SECONDS)
+        st.rerun()
+
+# --- Analysis Rendering ---
+
+def render_static_results(job_result, division, pose):
+    """Renders the results of a finished static analysis job."""
+    annotated_image = job_result["annotated_image"]
+    results = job_result["results"]
+    if results:
+        v_taper_ratio = results["v_taper_ratio"]
+        v_taper_score = results["v_taper_score"]
+        muscularity_results = results["muscularity"]
+        muscularity_score = muscularity_results["Overall Fullness"]
+        conditioning_results = results["conditioning"]
+        conditioning_score = conditioning_results["Overall Conditioning"]
+        total_score = results["total_score"]
+
+        st.header("Judge's Report Card")
+        tab1, tab2, tab3 = st.tabs(["🏆 Dashboard", "📊 Diagnostics", "🧠 Coaching"])
+
+        with tab1:
+            st.subheader(f"Total Package Score: {total_score}")
+            st.progress(total_score)
+            st.info("This score represents the complete package, balancing symmetry, muscularity, and conditioning.")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric(label="Symmetry (V-Taper)", value=v_taper_score)
+            with col2:
+                st.metric(label="Muscularity", value=muscularity_score, help="Placeholder score")
+            with col3:
+                st.metric(label="Conditioning", value=conditioning_score, help="Placeholder score")
+
+        with tab2:
+            st.subheader("Diagnostic Breakdown")
+            img_col, data_col = st.columns([2,3])
+            with img_col:
+                st.image(annotated_image, caption="Preprocessed image with landmarks.", use_column_width=True)
+            with data_col:
+                st.write("**V-Taper Details:**")
+                st.text(f"Shoulder-to-Waist Ratio: {v_taper_ratio:.2f}")
+                st.write("--- ")
+                st.write("**Muscularity Details (Placeholder):**")
+                st.json(muscularity_results)
+                st.write("--- ")
+                st.write("**Conditioning Details (Placeholder):**")
+                st.json(conditioning_results)
+
+            timings = job_result.get("timings")
+            if timings:
+                with st.expander("Pipeline Timings"):
+                    st.caption(f"Time spent in each stage of this analysis ({sum(t['seconds'] for t in timings):.2f}s in total).")
+                    st.table(timings)
+
+        with tab3:
+            st.subheader("AI-Generated Coaching")
+            st.write("Based on your scores, here are the key areas to focus on:")
+            if v_taper_score < 80:
+                st.warning(f"**V-Taper (Score: {v_taper_score}):** Your shoulder-to-waist ratio is the primary area for improvement.")
+            else:
+                st.success(f"**V-Taper (Score: {v_taper_score}):** Your V-Taper is a dominant strong point!")
+            st.info("More detailed coaching will be available when the Anatomist Module is fully trained.")
+    else:
+        st.error("Could not detect a pose in the image. Please try a different photo.")
+
+def render_routine_phases(phases, video_file, division, quality):
+    """
+    Renders the routine timeline; each phase carries its stability or flow score.
+    Returns the statuses of the full static analyses run on held poses.
+    """
+    pose_statuses = []
+    for i, phase in enumerate(phases):
+        if phase['type'] == 'Held Pose':
+            with st.expander(f"✅ Phase {i+1}: {phase['details']} ({phase['start_time']:.1f}s - {phase['end_time']:.1f}s)"):
+                st.write(f"**Duration:** {phase['end_time'] - phase['start_time']:.1f} seconds")
+
+                presence_scores = analyze_stage_presence(None)
+
+                st.write("**Pose & Poise Critique:**")
+                scol1, scol2 = st.columns(2)
+                with scol1:
+                    st.metric("Stability Score", f"{phase['score']} / 100")
+                with scol2:
+                    st.metric("Stage Presence", f"{presence_scores['overall_presence_score']} / 100", help="Placeholder score")
+
+                # Only the pose's sharpest, stillest keyframes go through the full pipeline.
+                if st.button("Run Full Static Analysis on this Pose", key=f"analyze_{i}"):
+                    submit_job(f"pose_job_{i}", lambda: job_queue.submit_pose(video_file, phase['landmarks'], division, quality))
+                status = track_job(f"pose_job_{i}")
+
+            # Rendered outside the phase's expander, since expanders cannot be nested.
+            if status is not None:
+                pose_statuses.append(status)
+                if status.state == DONE:
+                    render_pose_results(status.result, division, i)
+        else: # Transition
+            with st.expander(f"🔄 Phase {i+1}: {phase['details']} ({phase['start_time']:.1f}s - {phase['end_time']:.1f}s)"):
+                st.write(f"**Duration:** {phase['end_time'] - phase['start_time']:.1f} seconds")
+                st.metric("Flow Score", f"{phase['score']} / 100", help="Measures the smoothness of the transition.")
+    return pose_statuses
+
+def render_pose_results(job_result, division, phase_index):
+    """Renders the keyframe analysis of one held pose."""
+    st.subheader(f"Phase {phase_index+1}: Full Static Analysis")
+    keyframes = job_result["keyframes"]
+    scored = [k for k in keyframes if k["total_score"] is not None]
+    st.caption(f"Scores are the median over {len(scored)} of {len(keyframes)} keyframes, "
+               "chosen as the sharpest and stillest frames of the pose.")
+    st.table(keyframes)
+    render_static_results(job_result, division, None)
 
 # --- UI Rendering ---
 st.title("PosePerfect AI 💪")
@@ -101,6 +193,21 @@ with st.sidebar:
         else:
             pose = st.selectbox("Select Your Pose:", ("Pose options not yet available for this division.",))
 
+    quality = st.select_slider(
+        "Analysis Quality:",
+        options=list(QUALITY_PRESETS),
+        value=DEFAULT_QUALITY,
+        help="Higher quality analyzes your photo (or a video pose's keyframes) at a higher resolution with a larger pose model, which takes longer."
+    )
+
+    # Models are shared by every session for the life of the server process.
+    with st.expander("Loaded Models"):
+        model_stats = get_resource_manager().stats()
+        if model_stats:
+            st.table(model_stats)
+        else:
+            st.caption("No models loaded yet.")
+
 # --- Main Panel ---
 st.header(f"{analysis_mode} Dashboard")
 
@@ -108,42 +215,30 @@ if analysis_mode == "Static (Image)":
     uploaded_file = st.file_uploader("Upload your image (JPG, PNG)", type=["jpg", "png"])
     if uploaded_file:
         if st.button("Analyze Pose"):
-            run_static_analysis(uploaded_file.getvalue(), division, pose)
+            submit_job("static_job", lambda: job_queue.submit_image(uploaded_file.getvalue(), division, quality))
+        status = track_job("static_job")
+        if status is not None and status.state == DONE:
+            render_static_results(status.result, division, pose)
+        rerun_while_running(status)
 else: # Dynamic (Video) Mode
     uploaded_file = st.file_uploader("Upload your video (MP4, MOV, AVI)", type=["mp4", "mov", "avi"])
     if uploaded_file:
         st.video(uploaded_file)
         if st.button("Analyze Routine"):
-            with st.spinner("Deconstructing routine... This may take a moment."):
-                video_bytes = uploaded_file.getvalue()
-                routine_timeline = deconstruct_routine(video_bytes)
-                
-                st.success("Routine deconstruction complete!")
+            # Pose analyses belong to the previous routine's phases.
+            for state_key in [key for key in st.session_state if key.startswith("pose_job_")]:
+                job_queue.cancel(st.session_state.pop(state_key))
+            # The upload is spooled to disk in chunks and decoded in a worker.
+            submit_job("routine_job", lambda: job_queue.submit_video(uploaded_file))
+        status = track_job("routine_job")
+        pose_statuses = []
+        if status is not None and status.state != CANCELLED:
+            # Phases are rendered as soon as the worker detects them, while the
+            # rest of the video is still being decoded.
+            phases = status.result if status.state == DONE else status.partial_results
+            if phases:
                 st.header("Detected Routine Timeline")
-                st.info("This is a placeholder timeline. The real version will identify poses from your video.")
-
-                for i, phase in enumerate(routine_timeline):
-                    if phase['type'] == 'Held Pose':
-                        with st.expander(f"✅ Phase {i+1}: {phase['details']} ({phase['start_time']:.1f}s - {phase['end_time']:.1f}s)"):
-                            st.write(f"**Duration:** {phase['end_time'] - phase['start_time']:.1f} seconds")
-                            
-                            # Call placeholder analysis functions for poise and presence
-                            stability_score = analyze_stability(None, None)
-                            presence_scores = analyze_stage_presence(None)
-
-                            st.write("**Pose & Poise Critique (Placeholders):**")
-                            scol1, scol2 = st.columns(2)
-                            with scol1:
-                                st.metric("Stability Score", f"{stability_score} / 100")
-                            with scol2:
-                                st.metric("Stage Presence", f"{presence_scores['overall_presence_score']} / 100")
-
-                            if st.button("Run Full Static Analysis on this Pose", key=f"analyze_{i}"):
-                                st.warning("Feature not yet implemented. This will run the full static analysis on a frame from this pose.")
-                    else: # Transition
-                        with st.expander(f"🔄 Phase {i+1}: {phase['details']} ({phase['start_time']:.1f}s - {phase['end_time']:.1f}s)"):
-                            st.write(f"**Duration:** {phase['end_time'] - phase['start_time']:.1f} seconds")
-                            
-                            # Call placeholder analysis function for flow
-                            flow_score = analyze_flow(None, None)
-                            st.metric("Flow Score", f"{flow_score} / 100", help="Measures the smoothness of the transition.")
\ No newline at end of file
+                pose_statuses = render_routine_phases(phases, uploaded_file, division, quality)
+            if status.state == DONE:
+                st.success("Routine deconstruction complete!")
+        rerun_while_running(status, *pose_statuses)
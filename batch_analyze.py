@@ -0,0 +1,24 @@
+import os
+import argparse
+
+# To make this script runnable from the root directory, we add the project path.
+import sys
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+from poseperfect_ai.analysis.batch_analyzer import analyze_directory
+from poseperfect_ai.analysis.static_analyzer import DEFAULT_DIVISION, DIVISION_WEIGHTS
+from poseperfect_ai.preprocessing.image_preprocessor import DEFAULT_QUALITY, QUALITY_PRESETS
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every image in a directory with the static analyzer.")
+    parser.add_argument("--input_dir", type=str, required=True, help="Directory containing the images to score.")
+    parser.add_argument("--output", type=str, required=True, help="Result file (.csv, .jsonl or .parquet).")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (1 = run in-process).")
+    parser.add_argument("--max_in_flight", type=int, default=None, help="Maximum images queued at once (default: 2 per worker).")
+    parser.add_argument("--recursive", action="store_true", help="Also score images in subdirectories.")
+    parser.add_argument("--division", type=str, default=DEFAULT_DIVISION, choices=list(DIVISION_WEIGHTS), help="Competition division used for the Total Package Score.")
+    parser.add_argument("--quality", type=str, default=DEFAULT_QUALITY, choices=list(QUALITY_PRESETS), help="Working resolution and pose model size (fast, balanced or full).")
+
+    args = parser.parse_args()
+
+    analyze_directory(args.input_dir, args.output, args.workers, args.recursive, args.max_in_flight, args.division, args.quality)
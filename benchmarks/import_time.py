@@ -0,0 +1,74 @@
+import os
+import argparse
+import json
+import statistics
+import subprocess
+
+# To make this script runnable from the root directory, we add the project path.
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+# Modules the Streamlit app imports at the top of every script run, followed by
+# the heavy backends they defer, for comparison.
+APP_MODULES = [
+    "poseperfect_ai.preprocessing.image_preprocessor",
+    "poseperfect_ai.analysis.static_analyzer",
+    "poseperfect_ai.analysis.dynamic_analyzer",
+    "poseperfect_ai.preload",
+]
+BACKEND_MODULES = ["cv2", "mediapipe", "rembg", "scipy.signal"]
+
+# Runs in a fresh interpreter: times the import and reports which heavy backends
+# ended up in sys.modules as a side effect.
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+loaded = [name for name in {backends!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "loaded_backends": loaded}}))
+"""
+
+def time_import(module: str, repeats: int = 3) -> dict:
+    """
+    Measures the cold import time of a module, in a new interpreter each time.
+
+    Returns:
+        A dictionary with the median time in seconds and the heavy backends the
+        import pulled in.
+    """
+    timings, loaded = [], []
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, backends=BACKEND_MODULES)],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+        )
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        timings.append(probe["seconds"])
+        loaded = probe["loaded_backends"]
+    return {"module": module, "seconds": statistics.median(timings), "loaded_backends": loaded}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cold import time of the app's modules.")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh interpreters per module (the median is reported).")
+    parser.add_argument("--max_seconds", type=float, default=None, help="Fail if any app module takes longer than this to import.")
+    parser.add_argument("--skip_backends", action="store_true", help="Only time the app modules, not the raw backends.")
+    args = parser.parse_args()
+
+    modules = APP_MODULES + ([] if args.skip_backends else BACKEND_MODULES)
+    failures = []
+    print(f"{'module':<52} {'seconds':>8}  heavy backends loaded")
+    for module in modules:
+        try:
+            result = time_import(module, args.repeats)
+        except subprocess.CalledProcessError as e:
+            print(f"{module:<52} {'error':>8}  {e.stderr.strip().splitlines()[-1] if e.stderr else ''}")
+            continue
+        print(f"{module:<52} {result['seconds']:>8.3f}  {', '.join(result['loaded_backends']) or '-'}")
+        if args.max_seconds is not None and module in APP_MODULES and result["seconds"] > args.max_seconds:
+            failures.append(module)
+
+    if failures:
+        print(f"\n[FAIL] Import time above {args.max_seconds}s: {', '.join(failures)}")
+        sys.exit(1)
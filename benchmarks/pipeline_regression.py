@@ -0,0 +1,303 @@
+import os
+import argparse
+import json
+import platform
+import tempfile
+import threading
+import time
+from typing import Any, Callable, List, NamedTuple
+
+# To make this script runnable from the root directory, we add the project path.
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+
+from poseperfect_ai.analysis.batch_analyzer import find_images
+from poseperfect_ai.analysis.dynamic_analyzer import deconstruct_routine
+from poseperfect_ai.analysis.static_analyzer import (
+    analyze_static_pose,
+    calculate_total_package_scores,
+    calculate_v_taper_ratios,
+    get_v_taper_scores,
+)
+from poseperfect_ai.preprocessing.background_remover import get_background_remover
+from poseperfect_ai.preprocessing.image_preprocessor import (
+    DEFAULT_QUALITY,
+    QUALITY_PRESETS,
+    decode_image,
+    detect_and_draw_landmarks,
+    detect_landmarks,
+    normalize_lighting,
+    preprocess_for_static_analysis,
+)
+from poseperfect_ai.preprocessing.video_decoder import get_video_info, iter_video_frames
+from poseperfect_ai.preprocessing.video_landmarks import extract_landmark_series
+from poseperfect_ai.utils.lazy import lazy_import
+from poseperfect_ai.utils.resources import current_rss
+
+cv2 = lazy_import("cv2")
+landmark_pb2 = lazy_import("mediapipe.framework.formats.landmark_pb2")
+
+DEFAULT_IMAGE_DIR = os.path.join(PROJECT_ROOT, "Men's Physique Posing Shots")
+DEFAULT_BASELINE_PATH = os.path.join(PROJECT_ROOT, "benchmarks", "pipeline_baseline.json")
+
+# A stage fails when its median latency or peak RSS grows by more than this
+# fraction over the baseline.
+DEFAULT_MAX_REGRESSION = 0.25
+DEFAULT_MAX_RSS_REGRESSION = 0.25
+
+SYNTHETIC_IMAGE_SIZE = (1024, 1536)
+LARGE_IMAGE_SIZE = (4000, 6000)
+BATCH_SCORING_ROWS = 10000
+VIDEO_SIZE = (640, 480)
+VIDEO_FPS = 15
+
+# --- Inputs ---
+
+def synthetic_photo(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """A lit-from-one-side RGB image with a bright figure-shaped blob and sensor noise."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.repeat((xx / width * 120 + 40)[..., None], 3, axis=2)
+    figure = ((xx - width / 2) / (width * 0.18)) ** 2 + ((yy - height / 2) / (height * 0.4)) ** 2 < 1
+    image[figure] = (200, 150, 120)
+    image += rng.normal(0, 12, image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+def encode_jpeg(image: np.ndarray) -> bytes:
+    ok, buffer = cv2.imencode(".jpg", cv2.cvtColor(image, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buffer.tobytes()
+
+def synthetic_landmarks() -> "landmark_pb2.NormalizedLandmarkList":
+    """A front-facing standing pose with every landmark visible."""
+    points = np.zeros((33, 2), dtype=np.float32) + (0.5, 0.5)
+    points[[11, 12]] = (0.36, 0.3), (0.64, 0.3)     # shoulders
+    points[[23, 24]] = (0.43, 0.55), (0.57, 0.55)   # hips
+    return landmark_pb2.NormalizedLandmarkList(landmark=[
+        landmark_pb2.NormalizedLandmark(x=x, y=y, z=0.0, visibility=1.0) for x, y in points
+    ])
+
+def write_synthetic_video(path: str, still: np.ndarray, seconds_per_hold: float = 2.0, holds: int = 3) -> int:
+    """
+    Writes a routine-like MJPEG video: the athlete holds a pose, slides across the
+    frame, and holds again. Returns the number of frames written.
+    """
+    width, height = VIDEO_SIZE
+    scale = min(width / still.shape[1], height / still.shape[0]) * 0.9
+    athlete = cv2.resize(still, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    canvas = np.full((height, width, 3), 30, dtype=np.uint8)
+    x0, y0 = (width - athlete.shape[1]) // 2, (height - athlete.shape[0]) // 2
+    canvas[y0:y0 + athlete.shape[0], x0:x0 + athlete.shape[1]] = athlete
+    canvas = cv2.cvtColor(canvas, cv2.COLOR_RGB2BGR)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), VIDEO_FPS, VIDEO_SIZE)
+    hold_frames, move_frames = int(seconds_per_hold * VIDEO_FPS), VIDEO_FPS
+    rng = np.random.default_rng(0)
+    offset, frames = 0.0, 0
+    try:
+        for hold in range(holds):
+            for i in range(hold_frames + (move_frames if hold < holds - 1 else 0)):
+                if i >= hold_frames:
+                    offset += (width * 0.1 if hold % 2 == 0 else -width * 0.1) / move_frames
+                shift = np.float32([[1, 0, offset + rng.normal(0, 0.3)], [0, 1, rng.normal(0, 0.3)]])
+                writer.write(cv2.warpAffine(canvas, shift, VIDEO_SIZE, borderValue=(30, 30, 30)))
+                frames += 1
+    finally:
+        writer.release()
+    return frames
+
+# --- Measurement ---
+
+class PeakRssSampler:
+    """Samples RSS on a background thread and keeps the peak, while in the `with` block."""
+
+    def __init__(self, interval_seconds: float = 0.005):
+        self.interval_seconds = interval_seconds
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            self.peak = max(self.peak, current_rss())
+
+    def __enter__(self) -> "PeakRssSampler":
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+class Stage(NamedTuple):
+    """One timed pipeline stage: `run` is called once per input."""
+    name: str
+    inputs: List[Any]
+    run: Callable[[Any], Any]
+    unit: str = "images"
+    units_per_call: int = 1
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+def measure_stage(stage: Stage, repeats: int) -> dict:
+    """
+    Runs a stage once per input as a warm-up, then `repeats` timed passes.
+
+    Returns:
+        Latency percentiles in milliseconds, throughput in units per second and
+        the peak RSS in MB, or {"skipped": reason} if the warm-up failed.
+    """
+    try:
+        for item in stage.inputs:
+            stage.run(item)
+    except Exception as e:
+        return {"skipped": f"{type(e).__name__}: {e}".splitlines()[0][:80]}
+
+    latencies = []
+    with PeakRssSampler() as rss:
+        for _ in range(repeats):
+            for item in stage.inputs:
+                start_time = time.perf_counter()
+                stage.run(item)
+                latencies.append(time.perf_counter() - start_time)
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "throughput": round(len(latencies) * stage.units_per_call / sum(latencies), 2),
+        "unit": stage.unit,
+        "peak_rss_mb": round(rss.peak / 1e6, 1),
+    }
+
+def build_stages(image_dir: str, quality: str, video_path: str) -> List[Stage]:
+    """The pipeline stages, each with its inputs prepared ahead of timing."""
+    settings = QUALITY_PRESETS[quality]
+    photos = []
+    for path in find_images(image_dir):
+        with open(path, 'rb') as f:
+            photos.append(f.read())
+    photos.append(encode_jpeg(synthetic_photo(*SYNTHETIC_IMAGE_SIZE)))
+    working = [np.array(decode_image(data, settings.max_dimension).convert('RGB')) for data in photos]
+    large = synthetic_photo(*LARGE_IMAGE_SIZE, seed=1)
+
+    # normalize_lighting writes into a scratch buffer so inputs stay unchanged.
+    def normalize_into_scratch(image: np.ndarray) -> np.ndarray:
+        return normalize_lighting(image, out=np.empty_like(image))
+
+    landmarks = synthetic_landmarks()
+    rows = np.random.default_rng(0).random((BATCH_SCORING_ROWS, 33, 4)).astype(np.float32)
+    frame_count = get_video_info(video_path).frame_count
+
+    def score_rows(batch: np.ndarray) -> np.ndarray:
+        v_taper = get_v_taper_scores(calculate_v_taper_ratios(batch))
+        return calculate_total_package_scores(v_taper, 50, 50)
+
+    return [
+        Stage("decode_image", photos, lambda data: decode_image(data, settings.max_dimension).load()),
+        Stage("normalize_lighting", working, normalize_into_scratch),
+        Stage("normalize_lighting_large", [large], normalize_into_scratch),
+        Stage("remove_background", working, lambda image: get_background_remover().remove(image, only_mask=True)),
+        Stage("detect_landmarks", working, lambda image: detect_landmarks(image, settings.model_complexity)),
+        Stage("detect_and_draw_landmarks", working,
+              lambda image: detect_and_draw_landmarks(image, settings.model_complexity)),
+        Stage("preprocess_for_static_analysis", photos,
+              lambda data: preprocess_for_static_analysis(data, use_cache=False, quality=quality, annotate=False)),
+        Stage("analyze_static_pose", working, lambda image: analyze_static_pose(image, landmarks)),
+        Stage("batch_scoring", [rows], score_rows, unit="rows", units_per_call=BATCH_SCORING_ROWS),
+        Stage("video_decode", [video_path], lambda path: sum(1 for _ in iter_video_frames(path)),
+              unit="frames", units_per_call=frame_count),
+        Stage("video_landmarks", [video_path], extract_landmark_series, unit="frames", units_per_call=frame_count),
+        Stage("routine_phases", [video_path], deconstruct_routine, unit="frames", units_per_call=frame_count),
+    ]
+
+# --- Baselines ---
+
+def compare_to_baseline(results: dict, baseline: dict, max_regression: float, max_rss_regression: float) -> List[str]:
+    """
+    Lists the stages whose median latency or peak RSS regressed past the thresholds.
+
+    RSS is cumulative (models loaded by earlier stages stay resident), so it is only
+    compared when the same stages ran as in the baseline.
+    """
+    regressions = []
+    compare_rss = set(results) == set(baseline.get("stages", {}))
+    for name, result in results.items():
+        reference = baseline.get("stages", {}).get(name)
+        if "skipped" in result or not reference or "skipped" in reference:
+            continue
+        if result["p50_ms"] > reference["p50_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p50 {reference['p50_ms']:.1f} -> {result['p50_ms']:.1f} ms")
+        if compare_rss and result["peak_rss_mb"] > reference["peak_rss_mb"] * (1 + max_rss_regression):
+            regressions.append(f"{name}: peak RSS {reference['peak_rss_mb']:.0f} -> {result['peak_rss_mb']:.0f} MB")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every analysis pipeline stage and check for regressions against a stored baseline.")
+    parser.add_argument("--image_dir", type=str, default=DEFAULT_IMAGE_DIR, help="Directory of fixture photos (a synthetic photo is always added).")
+    parser.add_argument("--quality", type=str, default=DEFAULT_QUALITY, choices=list(QUALITY_PRESETS), help="Preset used by the image stages.")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed passes over each stage's inputs (after one warm-up pass).")
+    parser.add_argument("--stages", type=str, nargs="+", default=None, help="Only run these stages.")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE_PATH, help="Baseline JSON file to compare against.")
+    parser.add_argument("--update_baseline", action="store_true", help="Write this run's results to the baseline file instead of comparing.")
+    parser.add_argument("--max_regression", type=float, default=DEFAULT_MAX_REGRESSION, help="Allowed fractional growth of a stage's median latency.")
+    parser.add_argument("--max_rss_regression", type=float, default=DEFAULT_MAX_RSS_REGRESSION, help="Allowed fractional growth of a stage's peak RSS.")
+    parser.add_argument("--output", type=str, default=None, help="Also write this run's results as JSON.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Step 1: Prepare the inputs, including a synthetic routine video
+        video_path = os.path.join(temp_dir, "routine.avi")
+        fixtures = find_images(args.image_dir)
+        if fixtures:
+            with open(fixtures[-1], 'rb') as f:
+                still = np.array(decode_image(f.read()).convert('RGB'))
+        else:
+            still = synthetic_photo(*SYNTHETIC_IMAGE_SIZE)
+        write_synthetic_video(video_path, still)
+        stages = build_stages(args.image_dir, args.quality, video_path)
+        if args.stages:
+            stages = [stage for stage in stages if stage.name in args.stages]
+
+        # Step 2: Time every stage
+        print(f"Benchmarking {len(stages)} stages at '{args.quality}' quality on {platform.processor() or platform.machine()}...")
+        print(f"\n{'stage':<32} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'throughput':>16} {'peak RSS':>9}")
+        results = {}
+        for stage in stages:
+            result = results[stage.name] = measure_stage(stage, args.repeats)
+            if "skipped" in result:
+                print(f"{stage.name:<32} skipped ({result['skipped']})")
+                continue
+            print(f"{stage.name:<32} {result['p50_ms']:>9.1f} {result['p90_ms']:>9.1f} {result['p99_ms']:>9.1f} "
+                  f"{result['throughput']:>9.1f} {stage.unit + '/s':<6} {result['peak_rss_mb']:>6.0f} MB")
+
+    report = {"quality": args.quality, "machine": platform.platform(), "python": platform.python_version(),
+              "stages": results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    # Step 3: Store or compare against the baseline
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.baseline}")
+        sys.exit(0)
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update_baseline to create one.")
+        sys.exit(0)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("quality") != args.quality:
+        print(f"\n[WARN] Baseline was recorded at '{baseline.get('quality')}' quality.")
+    regressions = compare_to_baseline(results, baseline, args.max_regression, args.max_rss_regression)
+    if regressions:
+        print(f"\n[FAIL] {len(regressions)} regression(s) against {args.baseline}:")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+    print(f"\n[OK] No stage regressed by more than {args.max_regression:.0%} against the baseline.")
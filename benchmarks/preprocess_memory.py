@@ -0,0 +1,83 @@
+import os
+import argparse
+import io
+import tracemalloc
+
+# To make this script runnable from the root directory, we add the project path.
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+import numpy as np
+from PIL import Image
+
+from poseperfect_ai.analysis.batch_analyzer import find_images
+from poseperfect_ai.preprocessing.image_preprocessor import (
+    DEFAULT_QUALITY,
+    QUALITY_PRESETS,
+    decode_image,
+    preprocess_for_static_analysis,
+)
+
+DEFAULT_IMAGE_DIR = os.path.join(PROJECT_ROOT, "Men's Physique Posing Shots")
+
+# Peak allocation allowed per image, in multiples of one working RGB frame. The
+# pipeline holds the crop, its mask and the output frame; the old path held about
+# eight frame-sized copies (RGBA, RGB, LAB, three channels, merged LAB, output).
+DEFAULT_MAX_FRAME_MULTIPLE = 3.0
+
+def synthetic_photo(width: int, height: int) -> bytes:
+    """A smooth, noisy JPEG of the given size, standing in for a phone photo."""
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    image = np.clip(gradient + rng.normal(0, 20, (height, width, 3)), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(image).save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+def peak_allocation(image_bytes: bytes, quality: str) -> int:
+    """
+    Peak bytes allocated by Python and NumPy/OpenCV arrays while preprocessing one
+    image (uncached, not annotated). Model runtimes allocate outside tracemalloc's
+    view, so this measures the pipeline's own buffers.
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        preprocess_for_static_analysis(image_bytes, use_cache=False, quality=quality, annotate=False)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the peak memory the static preprocessing allocates per image.")
+    parser.add_argument("--image_dir", type=str, default=DEFAULT_IMAGE_DIR, help="Directory of test photos.")
+    parser.add_argument("--quality", type=str, default=DEFAULT_QUALITY, choices=list(QUALITY_PRESETS), help="Preset to profile.")
+    parser.add_argument("--synthetic_size", type=int, nargs=2, default=[4000, 6000], metavar=("WIDTH", "HEIGHT"), help="Also profile a synthetic photo of this size.")
+    parser.add_argument("--max_frame_multiple", type=float, default=DEFAULT_MAX_FRAME_MULTIPLE, help="Fail if the peak exceeds this many working frames.")
+    args = parser.parse_args()
+
+    inputs = [(f"synthetic {args.synthetic_size[0]}x{args.synthetic_size[1]}", synthetic_photo(*args.synthetic_size))]
+    for path in find_images(args.image_dir):
+        with open(path, 'rb') as f:
+            inputs.append((os.path.basename(path), f.read()))
+
+    # Load the models first so their one-time allocations aren't counted.
+    preprocess_for_static_analysis(inputs[0][1], use_cache=False, quality=args.quality, annotate=False)
+
+    max_dimension = QUALITY_PRESETS[args.quality].max_dimension
+    failures = []
+    print(f"{'image':<32} {'working':>11} {'peak MB':>8} {'frames':>7}")
+    for name, image_bytes in inputs:
+        width, height = decode_image(image_bytes, max_dimension).size
+        frame_bytes = width * height * 3
+        peak = peak_allocation(image_bytes, args.quality)
+        multiple = peak / frame_bytes
+        print(f"{name[:32]:<32} {f'{width}x{height}':>11} {peak / 1e6:>8.2f} {multiple:>7.2f}")
+        if multiple > args.max_frame_multiple:
+            failures.append(name)
+
+    if failures:
+        print(f"\n[FAIL] Peak allocation above {args.max_frame_multiple} frames: {', '.join(failures)}")
+        sys.exit(1)
+    print(f"\n[OK] Every image stayed under {args.max_frame_multiple} working frames.")
@@ -0,0 +1,97 @@
+import os
+import argparse
+import io
+import statistics
+import time
+
+# To make this script runnable from the root directory, we add the project path.
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(PROJECT_ROOT)
+
+from PIL import Image
+
+from poseperfect_ai.analysis.batch_analyzer import find_images
+from poseperfect_ai.analysis.static_analyzer import calculate_v_taper_ratio
+from poseperfect_ai.preprocessing.image_preprocessor import QUALITY_PRESETS, preprocess_for_static_analysis
+
+DEFAULT_IMAGE_DIR = os.path.join(PROJECT_ROOT, "Men's Physique Posing Shots")
+REFERENCE_QUALITY = "full"
+
+def load_image_bytes(path: str, upscale_to: int = None) -> bytes:
+    """
+    Reads an image, optionally re-encoding it as a JPEG whose longest side is
+    `upscale_to` pixels, to stand in for full-resolution phone photos.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not upscale_to:
+        return data
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    scale = upscale_to / max(image.size)
+    image = image.resize((round(image.width * scale), round(image.height * scale)), Image.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+def measure(image_bytes: bytes, quality: str, repeats: int) -> dict:
+    """
+    Runs the uncached static preprocessing `repeats` times at one quality.
+
+    Returns:
+        A dictionary with the per-run latencies and the V-Taper ratio (None if no pose).
+    """
+    latencies = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        image, landmarks = preprocess_for_static_analysis(image_bytes, use_cache=False, quality=quality, annotate=False)
+        latencies.append(time.perf_counter() - start_time)
+    ratio = None
+    if landmarks:
+        height, width, _ = image.shape
+        ratio = calculate_v_taper_ratio(landmarks, width, height) or None
+    return {"latencies": latencies, "v_taper_ratio": ratio}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark static preprocessing latency against V-Taper accuracy for each quality preset.")
+    parser.add_argument("--image_dir", type=str, default=DEFAULT_IMAGE_DIR, help="Directory of test photos.")
+    parser.add_argument("--qualities", type=str, nargs="+", default=list(QUALITY_PRESETS), choices=list(QUALITY_PRESETS), help="Presets to compare.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs per image and preset (after one warm-up run).")
+    parser.add_argument("--upscale_to", type=int, default=None, help="Re-encode each photo with this longest side first (e.g. 6000 for a 24 MP phone photo).")
+    args = parser.parse_args()
+
+    qualities = list(dict.fromkeys(args.qualities + [REFERENCE_QUALITY]))
+    image_paths = find_images(args.image_dir)
+    print(f"Benchmarking {len(image_paths)} images at {', '.join(qualities)} quality...")
+
+    # Step 1: Measure every image at every preset
+    measurements = {quality: {} for quality in qualities}
+    for path in image_paths:
+        try:
+            image_bytes = load_image_bytes(path, args.upscale_to)
+        except OSError as e:
+            print(f"  - Skipping {os.path.basename(path)}: {e}")
+            continue
+        for quality in qualities:
+            # The first run loads the models for this preset; it is not timed.
+            preprocess_for_static_analysis(image_bytes, use_cache=False, quality=quality, annotate=False)
+            measurements[quality][path] = measure(image_bytes, quality, args.repeats)
+
+    # Step 2: Compare each preset against the full-resolution reference
+    reference = measurements[REFERENCE_QUALITY]
+    print(f"\n{'quality':<10} {'max side':>8} {'model':>5} {'p50 ms':>8} {'p90 ms':>8} {'posed':>6} {'V-Taper err':>11}")
+    for quality in qualities:
+        settings = QUALITY_PRESETS[quality]
+        latencies = [t for m in measurements[quality].values() for t in m["latencies"]]
+        if not latencies:
+            continue
+        deciles = statistics.quantiles(latencies, n=10) if len(latencies) > 1 else latencies * 9
+        detected = sum(m["v_taper_ratio"] is not None for m in measurements[quality].values())
+        errors = [abs(m["v_taper_ratio"] - reference[path]["v_taper_ratio"])
+                  for path, m in measurements[quality].items()
+                  if m["v_taper_ratio"] is not None and reference[path]["v_taper_ratio"] is not None]
+        error = f"{statistics.mean(errors):.3f}" if errors else "-"
+        print(f"{quality:<10} {settings.max_dimension or 'orig':>8} {settings.model_complexity:>5} "
+              f"{statistics.median(latencies) * 1000:>8.1f} {deciles[8] * 1000:>8.1f} "
+              f"{detected:>3}/{len(measurements[quality]):<2} {error:>11}")
+    print(f"\nV-Taper err is the mean absolute difference in shoulder-to-waist ratio from '{REFERENCE_QUALITY}'.")
@@ -1,93 +1,241 @@
-
-
 import os
 import argparse
+import hashlib
+import json
+import time
+from functools import partial
+from typing import Dict, Iterator, List, Optional, Tuple
+
 import cv2
 import numpy as np
-from PIL import Image
-import subprocess
-import io
 
 # To make this script runnable from the root directory, we add the project path.
 import sys
 sys.path.append(os.path.abspath(os.path.dirname(__file__)))
 
-# We only need normalize_lighting from our module now
-from poseperfect_ai.preprocessing.image_preprocessor import normalize_lighting
+from poseperfect_ai.preprocessing.background_remover import BackgroundRemover
+from poseperfect_ai.preprocessing.image_preprocessor import apply_alpha_mask, decode_image, normalize_lighting
+from poseperfect_ai.utils.parallel import WorkerCrashedError, create_process_pool, imap_bounded
+
+DEFAULT_BATCH_SIZE = 8
+MANIFEST_FILENAME = "manifest.jsonl"
+
+# (filename, sha256 of the input, error message or None)
+BatchResult = List[Tuple[str, str, Optional[str]]]
+
+# --- Manifest / checkpointing ---
+
+def _hash_file(path: str) -> str:
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(manifest_path: str) -> Dict[str, str]:
+    """
+    Loads the checkpoint manifest, an append-only JSONL file with one line per
+    completed image. Later lines win, so a re-processed file overrides its old hash.
+
+    Returns:
+        A mapping of input filename to the SHA-256 of the content that was processed.
+    """
+    completed = {}
+    if not os.path.exists(manifest_path):
+        return completed
+    with open(manifest_path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                completed[entry["input"]] = entry["sha256"]
+            except (ValueError, KeyError):
+                # A torn final line from a crash mid-write; that image is just redone.
+                continue
+    return completed
+
+# --- Per-worker processing ---
+
+_worker_remover: Optional[BackgroundRemover] = None
+
+def _init_worker(onnx_threads: Optional[int] = None):
+    """
+    Process-pool initializer: gives each worker its own rembg session. Parallelism
+    comes from the processes, so each session runs its batch on a single thread.
+    """
+    global _worker_remover
+    if onnx_threads:
+        os.environ.setdefault("OMP_NUM_THREADS", str(onnx_threads))
+    _worker_remover = BackgroundRemover(max_workers=1)
 
-def process_images(input_dir: str, output_dir: str):
+def _process_batch(input_dir: str, output_dir: str, filenames: List[str]) -> BatchResult:
+    """
+    Removes backgrounds, normalizes lighting and saves one batch of images.
+    """
+    results = []
+    batch_files, batch_images, batch_hashes = [], [], []
+    for filename in filenames:
+        try:
+            with open(os.path.join(input_dir, filename), 'rb') as f:
+                image_bytes = f.read()
+        except OSError as e:
+            results.append((filename, "", f"Could not read file: {e}"))
+            continue
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        try:
+            image_pil = decode_image(image_bytes)
+        except Exception as e:
+            results.append((filename, digest, f"Could not decode image: {e}"))
+            continue
+        batch_files.append(filename)
+        batch_images.append(image_pil)
+        batch_hashes.append(digest)
+
+    # Only the foreground masks are computed; each image stays in one buffer that
+    # is masked, normalized and converted for saving in place.
+    masks = _worker_remover.remove_batch(batch_images, return_exceptions=True, only_mask=True)
+
+    for filename, digest, image_pil, mask_pil in zip(batch_files, batch_hashes, batch_images, masks):
+        if isinstance(mask_pil, Exception):
+            results.append((filename, digest, f"Background removal failed: {mask_pil}"))
+            continue
+        try:
+            if image_pil.mode != 'RGB':
+                image_pil = image_pil.convert('RGB')
+            image_np = np.array(image_pil)
+            apply_alpha_mask(image_np, np.asarray(mask_pil))
+            normalize_lighting(image_np, out=image_np)
+            cv2.cvtColor(image_np, cv2.COLOR_RGB2BGR, dst=image_np)
+            output_path = os.path.join(output_dir, filename)
+            if not cv2.imwrite(output_path, image_np):
+                results.append((filename, digest, f"Failed to save image to {output_path}"))
+            else:
+                results.append((filename, digest, None))
+        except Exception as e:
+            results.append((filename, digest, f"Unexpected error: {e}"))
+    return results
+
+def _run_batches(input_dir: str, output_dir: str, batches: List[List[str]],
+                 workers: int, max_in_flight: int) -> Iterator[BatchResult]:
+    """
+    Yields batch results as they finish, either in-process (workers=1) or from a
+    process pool that never has more than `max_in_flight` batches queued.
+    """
+    if workers <= 1:
+        global _worker_remover
+        _worker_remover = BackgroundRemover()
+        for batch in batches:
+            yield _process_batch(input_dir, output_dir, batch)
+        return
+
+    # A worker that dies in native code (or is OOM-killed) breaks the whole pool.
+    # The images of the batches it had in flight are recorded as failed (they stay
+    # out of the manifest, so the next run redoes them), and the rest of the run
+    # continues on a fresh pool.
+    onnx_threads = max(1, (os.cpu_count() or 1) // workers)
+    remaining = iter(batches)
+    while True:
+        try:
+            with create_process_pool(workers, _init_worker, (onnx_threads,)) as executor:
+                yield from imap_bounded(executor, partial(_process_batch, input_dir, output_dir), remaining,
+                                        max_in_flight)
+            return
+        except WorkerCrashedError as e:
+            print(f"[WARN] A worker process died; recording {len(e.lost_items)} in-flight batch(es) as failed "
+                  "and restarting the pool.", flush=True)
+            for batch in e.lost_items:
+                yield [(filename, "", "BrokenProcessPool: the worker processing this batch died")
+                       for filename in batch]
+
+# --- Main pipeline ---
+
+def process_images(input_dir: str, output_dir: str, batch_size: int = DEFAULT_BATCH_SIZE,
+                   workers: int = 1, max_in_flight: Optional[int] = None, force: bool = False) -> dict:
     """
     Processes all images in a directory by removing the background and normalizing
     lighting, then saves them to an output directory.
+
+    Completed images are checkpointed in a manifest in the output directory, keyed
+    by input filename and content hash, so a rerun skips images that are unchanged
+    and already written, and only reprocesses new or modified files.
+
+    Args:
+        input_dir: Directory containing the raw input images.
+        output_dir: Directory where processed images (and the manifest) are saved.
+        batch_size: Images per background-removal batch (the unit of work).
+        workers: Number of worker processes; 1 runs everything in-process.
+        max_in_flight: Maximum batches queued at once (defaults to 2 per worker).
+        force: Reprocess every image, ignoring the manifest.
+
+    Returns:
+        A summary dictionary with processed/skipped/failed counts and throughput.
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         print(f"Created output directory: {output_dir}")
 
-    image_files = [f for f in os.path.listdir(input_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
-    
+    image_files = sorted(f for f in os.listdir(input_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    summary = {"found": len(image_files), "processed": 0, "skipped": 0, "failed": 0,
+               "seconds": 0.0, "images_per_second": 0.0}
+
     if not image_files:
         print(f"No images found in {input_dir}")
-        return
+        return summary
 
     print(f"Found {len(image_files)} images to process.")
 
+    # Step 1: Skip images whose current content was already processed
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    completed = {} if force else load_manifest(manifest_path)
+    pending = []
     for filename in image_files:
-        print(f"\n--- Processing {filename} ---")
-        # Define paths
-        input_path = os.path.join(input_dir, filename)
-        output_path = os.path.join(output_dir, filename)
-        # Create a temporary path for the background-removed image
-        temp_bg_removed_path = os.path.join(output_dir, f"temp_{filename}")
-
         try:
-            # Step 1: Remove background using rembg CLI via subprocess
-            print(f"  [1/4] Removing background (using CLI method)... ")
-            command = ["rembg", "i", input_path, temp_bg_removed_path]
-            # Using capture_output to hide rembg's own console output for a cleaner log
-            result = subprocess.run(command, check=True, capture_output=True, text=True)
-
-            # Step 2: Read the background-removed image for further processing
-            print(f"  [2/4] Reading temporary file...")
-            with open(temp_bg_removed_path, 'rb') as f:
-                image_bytes_no_bg = f.read()
-            
-            no_bg_image_pil = Image.open(io.BytesIO(image_bytes_no_bg))
-            if no_bg_image_pil.mode == 'RGBA':
-                no_bg_image_pil = no_bg_image_pil.convert('RGB')
-            image_np = np.array(no_bg_image_pil)
-
-            # Step 3: Lighting Normalization
-            print("  [3/4] Normalizing lighting...")
-            normalized_image = normalize_lighting(image_np)
-            
-            output_image_bgr = cv2.cvtColor(normalized_image, cv2.COLOR_RGB2BGR)
-
-            # Step 4: Save the final processed image
-            print(f"  [4/4] Saving final image to: {output_path}")
-            success = cv2.imwrite(output_path, output_image_bgr)
-            if not success:
-                print(f"  [ERROR] Failed to save image to {output_path}.")
-            else:
+            digest = _hash_file(os.path.join(input_dir, filename))
+        except OSError as e:
+            print(f"  [ERROR] Could not read {filename}: {e}")
+            summary["failed"] += 1
+            continue
+        if completed.get(filename) == digest and os.path.exists(os.path.join(output_dir, filename)):
+            summary["skipped"] += 1
+        else:
+            pending.append(filename)
+    print(f"Skipping {summary['skipped']} unchanged images; {len(pending)} to process with {workers} worker(s).")
+
+    # Step 2: Process the remaining images in batches, checkpointing each result
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    max_in_flight = max_in_flight or 2 * max(workers, 1)
+    start_time = time.perf_counter()
+    with open(manifest_path, 'a') as manifest_file:
+        for results in _run_batches(input_dir, output_dir, batches, workers, max_in_flight):
+            for filename, digest, error in results:
+                if error:
+                    print(f"  [ERROR] {filename}: {error}", flush=True)
+                    summary["failed"] += 1
+                    continue
+                manifest_file.write(json.dumps({"input": filename, "sha256": digest}) + "\n")
+                summary["processed"] += 1
                 print(f"  -> Successfully saved {filename}")
+            manifest_file.flush()
 
-        except subprocess.CalledProcessError as e:
-            print(f"  [ERROR] Background removal failed for {filename}.")
-            print(f"  - STDERR: {e.stderr}")
-        except Exception as e:
-            print(f"  [UNEXPECTED ERROR] Failed to process {filename}: {e}", flush=True)
-        finally:
-            # Clean up the temporary file if it exists
-            if os.path.exists(temp_bg_removed_path):
-                os.remove(temp_bg_removed_path)
+    # Step 3: Report throughput and errors
+    summary["seconds"] = round(time.perf_counter() - start_time, 2)
+    if summary["seconds"] > 0:
+        summary["images_per_second"] = round(summary["processed"] / summary["seconds"], 2)
 
     print(f"\n--- All processing complete. ---")
+    print(f"Processed: {summary['processed']}  Skipped: {summary['skipped']}  Failed: {summary['failed']}")
+    print(f"Elapsed: {summary['seconds']}s  Throughput: {summary['images_per_second']} images/s")
+    return summary
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Preprocess images for dataset creation.")
     parser.add_argument("--input_dir", type=str, required=True, help="Directory containing the raw input images.")
     parser.add_argument("--output_dir", type=str, required=True, help="Directory where processed images will be saved.")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE, help="Number of images to hold in memory and remove backgrounds for at once.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes (1 = run in-process).")
+    parser.add_argument("--max_in_flight", type=int, default=None, help="Maximum batches queued at once (default: 2 per worker).")
+    parser.add_argument("--force", action="store_true", help="Reprocess every image, ignoring the manifest.")
 
     args = parser.parse_args()
 
-    process_images(args.input_dir, args.output_dir)
+    process_images(args.input_dir, args.output_dir, args.batch_size, args.workers, args.max_in_flight, args.force)
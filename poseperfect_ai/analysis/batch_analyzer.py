@@ -0,0 +1,233 @@
+import csv
+import json
+import os
+import time
+from functools import partial
+from typing import Iterable, Iterator, List, Optional
+
+from ..preprocessing.image_preprocessor import DEFAULT_QUALITY, preprocess_for_static_analysis
+from ..utils.parallel import WorkerCrashedError, create_process_pool, imap_bounded
+from .static_analyzer import DEFAULT_DIVISION, analyze_static_pose
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+# Columns written for every image, in order.
+RESULT_FIELDS = [
+    "image", "status", "error",
+    "v_taper_ratio", "v_taper_score", "muscularity_score", "conditioning_score", "total_score",
+    "seconds",
+]
+
+# --- Per-image analysis ---
+
+def analyze_image_file(image_path: str, division: str = DEFAULT_DIVISION, quality: str = DEFAULT_QUALITY) -> dict:
+    """
+    Runs the full static analysis on one image file.
+
+    Never raises: unreadable or undecodable files (e.g. partial `.crdownload`
+    downloads) come back with status "error" and the reason in "error".
+
+    Returns:
+        A flat result row with the keys in RESULT_FIELDS.
+    """
+    row = dict.fromkeys(RESULT_FIELDS)
+    row["image"] = image_path
+    start_time = time.perf_counter()
+    try:
+        with open(image_path, 'rb') as f:
+            image_bytes = f.read()
+        # The result cache only helps interactive resubmission; skip it here.
+        image, pose_landmarks = preprocess_for_static_analysis(image_bytes, use_cache=False, quality=quality,
+                                                               annotate=False)
+        if not pose_landmarks:
+            row["status"] = "no_pose"
+        else:
+            results = analyze_static_pose(image, pose_landmarks, division=division)
+            row.update({
+                "status": "ok",
+                "v_taper_ratio": round(results["v_taper_ratio"], 4),
+                "v_taper_score": results["v_taper_score"],
+                "muscularity_score": results["muscularity"]["Overall Fullness"],
+                "conditioning_score": results["conditioning"]["Overall Conditioning"],
+                "total_score": results["total_score"],
+            })
+    except Exception as e:
+        row["status"] = "error"
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - start_time, 3)
+    return row
+
+def analyze_images(image_paths: Iterable[str], workers: int = 1, max_in_flight: Optional[int] = None,
+                   division: str = DEFAULT_DIVISION, quality: str = DEFAULT_QUALITY) -> Iterator[dict]:
+    """
+    Analyzes many images, yielding one result row per image as it completes.
+
+    Args:
+        image_paths: Paths of the images to analyze.
+        workers: Number of worker processes; 1 runs everything in-process.
+        max_in_flight: Maximum images queued at once (defaults to 2 per worker).
+        division: The competition division used for the Total Package Score.
+        quality: A key of QUALITY_PRESETS, trading accuracy for speed.
+
+    Yields:
+        Result rows (see `analyze_image_file`), in completion order.
+    """
+    analyze = partial(analyze_image_file, division=division, quality=quality)
+    if workers <= 1:
+        for image_path in image_paths:
+            yield analyze(image_path)
+        return
+
+    # A worker that dies in native code (or is OOM-killed) breaks the whole pool.
+    # The images it had in flight are recorded as errors, and the rest of the run
+    # continues on a fresh pool.
+    remaining = iter(image_paths)
+    while True:
+        try:
+            with create_process_pool(workers) as executor:
+                yield from imap_bounded(executor, analyze, remaining, max_in_flight or 2 * workers)
+            return
+        except WorkerCrashedError as e:
+            print(f"[WARN] A worker process died; recording {len(e.lost_items)} in-flight image(s) as errors "
+                  "and restarting the pool.")
+            for image_path in e.lost_items:
+                row = dict.fromkeys(RESULT_FIELDS)
+                row.update({"image": image_path, "status": "error",
+                            "error": "BrokenProcessPool: the worker analyzing this batch died"})
+                yield row
+
+# --- Streaming result writers ---
+
+class _CsvResultWriter:
+    def __init__(self, path: str):
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS)
+        self._writer.writeheader()
+
+    def write(self, row: dict) -> None:
+        self._writer.writerow(row)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+class _JsonlResultWriter:
+    def __init__(self, path: str):
+        self._file = open(path, 'w')
+
+    def write(self, row: dict) -> None:
+        self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+class _ParquetResultWriter:
+    """Buffers rows and writes them as Parquet row groups. Requires pyarrow."""
+
+    ROW_GROUP_SIZE = 1000
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Writing Parquet requires pyarrow: pip install pyarrow") from e
+        self._pa = pa
+        self._schema = pa.schema([
+            ("image", pa.string()), ("status", pa.string()), ("error", pa.string()),
+            ("v_taper_ratio", pa.float64()), ("v_taper_score", pa.int64()),
+            ("muscularity_score", pa.int64()), ("conditioning_score", pa.int64()),
+            ("total_score", pa.int64()), ("seconds", pa.float64()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._rows: List[dict] = []
+
+    def write(self, row: dict) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._rows:
+            self._writer.write_table(self._pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+
+_WRITERS = {
+    ".csv": _CsvResultWriter,
+    ".jsonl": _JsonlResultWriter,
+    ".parquet": _ParquetResultWriter,
+}
+
+def open_result_writer(output_path: str):
+    """
+    Opens a streaming result writer, choosing CSV, JSONL or Parquet from the
+    output file extension.
+    """
+    extension = os.path.splitext(output_path)[1].lower()
+    if extension not in _WRITERS:
+        raise ValueError(f"Unsupported output format '{extension}'. Use one of: {', '.join(_WRITERS)}")
+    return _WRITERS[extension](output_path)
+
+# --- Directory entry point ---
+
+def find_images(input_dir: str, recursive: bool = False) -> List[str]:
+    """Lists image files in a directory, sorted, by extension."""
+    image_paths = []
+    for root, dirs, files in os.walk(input_dir):
+        image_paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+        if not recursive:
+            break
+    return sorted(image_paths)
+
+def analyze_directory(input_dir: str, output_path: str, workers: int = 1, recursive: bool = False,
+                      max_in_flight: Optional[int] = None, division: str = DEFAULT_DIVISION,
+                      quality: str = DEFAULT_QUALITY) -> dict:
+    """
+    Scores every image in a directory and streams the results to a file.
+
+    Files without an image extension (e.g. `.crdownload` partials) are ignored,
+    and images that fail to decode or analyze are recorded as errors without
+    stopping the run.
+
+    Args:
+        input_dir: Directory containing the images.
+        output_path: Result file; `.csv`, `.jsonl` or `.parquet`.
+        workers: Number of worker processes.
+        recursive: Also analyze images in subdirectories.
+        max_in_flight: Maximum images queued at once.
+        division: The competition division used for the Total Package Score.
+        quality: A key of QUALITY_PRESETS, trading accuracy for speed.
+
+    Returns:
+        A summary dictionary with per-status counts and throughput.
+    """
+    image_paths = find_images(input_dir, recursive)
+    summary = {"found": len(image_paths), "ok": 0, "no_pose": 0, "error": 0,
+               "seconds": 0.0, "images_per_second": 0.0}
+    print(f"Found {len(image_paths)} images to analyze with {workers} worker(s).")
+
+    start_time = time.perf_counter()
+    writer = open_result_writer(output_path)
+    try:
+        for row in analyze_images(image_paths, workers, max_in_flight, division, quality):
+            writer.write(row)
+            summary[row["status"]] += 1
+            if row["status"] == "error":
+                print(f"  [ERROR] {row['image']}: {row['error']}", flush=True)
+            else:
+                print(f"  -> {row['image']}: {row['status']} ({row['seconds']}s)")
+    finally:
+        writer.close()
+
+    summary["seconds"] = round(time.perf_counter() - start_time, 2)
+    if summary["seconds"] > 0:
+        summary["images_per_second"] = round(len(image_paths) / summary["seconds"], 2)
+    print(f"\n--- Batch analysis complete. ---")
+    print(f"OK: {summary['ok']}  No pose: {summary['no_pose']}  Errors: {summary['error']}")
+    print(f"Elapsed: {summary['seconds']}s  Throughput: {summary['images_per_second']} images/s")
+    return summary
@@ -1,61 +1,402 @@
 
 import numpy as np
+from typing import Iterator, List, Optional
 
-def deconstruct_routine(video_bytes: bytes) -> list:
+from ..utils.lazy import lazy_import
+from ..utils.metrics import timed
+from ..preprocessing.video_decoder import VideoSource, iter_video_frames
+from ..preprocessing.video_landmarks import DEFAULT_VIDEO_MAX_DIMENSION, LandmarkSeries, iter_frame_landmarks
+from .static_analyzer import LEFT_HIP, LEFT_SHOULDER, RIGHT_HIP, RIGHT_SHOULDER
+
+ndimage = lazy_import("scipy.ndimage")
+signal = lazy_import("scipy.signal")
+
+# Routines are segmented at a reduced frame rate; posing motion is slow enough
+# that 15 fps loses nothing and halves the pose-tracking cost of 30 fps video.
+DEFAULT_ROUTINE_FPS = 15.0
+
+def deconstruct_routine(video_source: VideoSource, target_fps: Optional[float] = DEFAULT_ROUTINE_FPS) -> list:
     """
-    [PLACEHOLDER] Analyzes a video to deconstruct a posing routine.
-    
-    This function will be replaced by a real frame-by-frame analysis using
-    a pose classification model.
+    Analyzes a video to deconstruct a posing routine into held poses and transitions.
+
+    Args:
+        video_source: A file path, raw bytes, or a binary file-like object.
+        target_fps: Frame rate to subsample the video to before pose tracking.
 
     Returns:
         A list of dictionaries, where each dictionary represents a
         detected phase (pose or transition) in the routine.
     """
-    
-    # In a real implementation, we would use OpenCV to process the video frames,
-    # run a pose classifier on each frame, and use a state machine to identify
-    # when a pose is being held versus when a transition is occurring.
-
-    # For now, we return a hardcoded, dummy data structure.
-    print("Simulating routine deconstruction...")
-
-    dummy_routine_timeline = [
-        {
-            "type": "Transition",
-            "start_time": 0.0,
-            "end_time": 2.1,
-            "details": "Walking to center stage"
-        },
-        {
-            "type": "Held Pose",
-            "start_time": 2.1,
-            "end_time": 6.5,
-            "details": "Front Pose"
-        },
-        {
-            "type": "Transition",
-            "start_time": 6.5,
-            "end_time": 8.0,
-            "details": "Executing back turn"
-        },
-        {
-            "type": "Held Pose",
-            "start_time": 8.0,
-            "end_time": 12.3,
-            "details": "Back Pose"
-        }
-    ]
+    return list(iter_routine_phases(video_source, target_fps))
+
+def iter_routine_phases(video_source: VideoSource, target_fps: Optional[float] = DEFAULT_ROUTINE_FPS,
+                        segmenter: Optional["RoutineSegmenter"] = None) -> Iterator[dict]:
+    """
+    Streams the phases of a routine as the video is decoded.
+
+    Each phase is yielded as soon as it ends, so a caller can render the timeline
+    while the rest of the video is still being processed.
+
+    Yields:
+        Phase dictionaries with "type", "start_time", "end_time", "details" and
+        "landmarks" (the LandmarkSeries of the phase).
+    """
+    segmenter = segmenter or RoutineSegmenter()
+    frames = iter_video_frames(video_source, target_fps=target_fps, max_dimension=DEFAULT_VIDEO_MAX_DIMENSION)
+    for frame, landmarks in iter_frame_landmarks(frames):
+        yield from segmenter.update(frame.timestamp, landmarks, frame.index)
+    yield from segmenter.finish()
+
+# --- Landmark metric helpers ---
+
+VISIBILITY_THRESHOLD = 0.5
+
+# Stability: jitter (landmark std over a sliding window, in torso lengths) at which
+# the score reaches 0. A perfectly still pose scores 100.
+STABILITY_JITTER_TOLERANCE = 0.05
+
+# Flow: log dimensionless jerk range. A minimum-jerk movement has a dimensionless
+# jerk of ~205 (log ~5.3) and scores 100; log 12 and above is scored 0.
+FLOW_LOG_JERK_IDEAL = 5.3
+FLOW_LOG_JERK_WORST = 12.0
+
+# Jerk is a third derivative and amplifies detector noise, so transitions are
+# smoothed over a longer window than held poses.
+STABILITY_SMOOTHING_SECONDS = 0.25
+FLOW_SMOOTHING_SECONDS = 0.6
+
+def _sample_interval(series: LandmarkSeries) -> float:
+    """Median time between samples, robust to the odd dropped frame."""
+    if len(series) < 2:
+        return 0.0
+    return float(np.median(np.diff(series.timestamps)))
+
+def visibility_weights(landmarks: np.ndarray, stencil: int = 1) -> np.ndarray:
+    """
+    Weights each joint of a landmark series by its visibility, for averaging
+    motion over joints.
+
+    A joint is zeroed wherever it is occluded anywhere within `stencil` frames,
+    so finite differences never straddle an occlusion.
+
+    Args:
+        landmarks: A (frames, 33, 4) landmark array.
+        stencil: The number of consecutive frames a finite difference spans.
+
+    Returns:
+        A (frames, 33) array of weights.
+    """
+    visibility = landmarks[..., 3].astype(np.float64)
+    weights = np.where(visibility >= VISIBILITY_THRESHOLD, visibility, 0.0)
+    if stencil > 1:
+        weights = ndimage.minimum_filter1d(weights, size=stencil, axis=0, mode='nearest')
+    return weights
+
+def body_scale(landmarks: np.ndarray, weights: np.ndarray) -> float:
+    """
+    Measures the athlete's size in the frame, so motion can be expressed in torso
+    lengths and does not depend on their distance from the camera.
+
+    Args:
+        landmarks: A (frames, 33, 4) landmark array.
+        weights: The series' visibility_weights.
+
+    Returns:
+        The median torso length (shoulder midpoint to hip midpoint) over the
+        frames where the torso is visible, or 0 if it never is.
+    """
+    shoulders = (landmarks[:, LEFT_SHOULDER, :2] + landmarks[:, RIGHT_SHOULDER, :2]) / 2
+    hips = (landmarks[:, LEFT_HIP, :2] + landmarks[:, RIGHT_HIP, :2]) / 2
+    visible = weights[:, [LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP]].min(axis=1) > 0
+    if not visible.any():
+        return 0.0
+    return float(np.median(np.linalg.norm(shoulders[visible] - hips[visible], axis=1)))
+
+def _smoothing_window(num_frames: int, fps: float, seconds: float, polyorder: int = 3) -> int:
+    """An odd Savitzky-Golay window of about `seconds`, valid for `num_frames`."""
+    window = max(int(round(seconds * fps)) | 1, polyorder + 2 | 1)
+    if window > num_frames:
+        window = num_frames if num_frames % 2 else num_frames - 1
+    return window
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sums over every length-`window` run along axis 0, via a cumulative sum."""
+    cumulative = np.cumsum(values, axis=0)
+    cumulative = np.concatenate([np.zeros_like(cumulative[:1]), cumulative], axis=0)
+    return cumulative[window:] - cumulative[:-window]
+
+def compute_landmark_jitter(series: LandmarkSeries, window_seconds: float = 1.0,
+                            smooth: bool = False) -> float:
+    """
+    Measures how much landmarks wander during a held pose.
+
+    The visibility-weighted standard deviation of each joint's (x, y) position is
+    taken over every sliding window of `window_seconds`, normalized by torso
+    length, and averaged over windows and joints. Everything is computed with
+    rolling sums over the whole (frames, 33, 4) array at once.
+
+    Args:
+        series: The landmark series of the held pose.
+        window_seconds: Length of the sliding window.
+        smooth: Apply Savitzky-Golay smoothing first, to suppress detector noise.
+
+    Returns:
+        The mean jitter in torso lengths, or NaN if there is not enough data.
+    """
+    num_frames = len(series)
+    fps = 1.0 / _sample_interval(series) if num_frames > 1 else 0.0
+    if num_frames < 3 or fps <= 0:
+        return float('nan')
+
+    positions = series.landmarks[..., :2].astype(np.float64)
+    weights = visibility_weights(series.landmarks)
+    scale = body_scale(series.landmarks, weights)
+    if scale <= 0:
+        return float('nan')
+
+    if smooth:
+        window = _smoothing_window(num_frames, fps, STABILITY_SMOOTHING_SECONDS)
+        if window > 3:
+            positions = signal.savgol_filter(positions, window, 3, axis=0, mode='interp')
 
-    return dummy_routine_timeline
+    # Weighted sliding-window variance: E[w*x^2]/E[w] - (E[w*x]/E[w])^2
+    window = min(max(int(round(window_seconds * fps)), 2), num_frames)
+    w = weights[..., None]
+    sum_w = _rolling_sum(weights, window)
+    sum_wx = _rolling_sum(w * positions, window)
+    sum_wxx = _rolling_sum(w * positions ** 2, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sum_wx / sum_w[..., None]
+        variance = np.clip(sum_wxx / sum_w[..., None] - mean ** 2, 0, None).sum(axis=-1)
+    std = np.sqrt(np.nan_to_num(variance))
 
-def analyze_stability(video_frames, landmarks) -> int:
+    # Only trust joints visible for most of the window
+    valid = sum_w >= VISIBILITY_THRESHOLD * window
+    if not valid.any():
+        return float('nan')
+    return float(np.average(std[valid], weights=sum_w[valid]) / scale)
+
+def compute_dimensionless_jerk(series: LandmarkSeries, smooth: bool = True) -> float:
     """
-    [PLACEHOLDER] Analyzes landmark jitter during a held pose.
+    Measures the smoothness of a movement as its log dimensionless jerk.
+
+    For each joint, jerk (the third time derivative of position) is integrated
+    as D^3 / v_peak^2 * integral(|jerk|^2 dt), which is independent of movement
+    size and duration. Joints are combined weighted by visibility and distance
+    travelled, so the limbs that actually move dominate. Derivatives come from
+    Savitzky-Golay filters (or plain finite differences) over the whole array.
+
+    Args:
+        series: The landmark series of the transition.
+        smooth: Differentiate with a Savitzky-Golay filter instead of raw
+            finite differences, which amplify detector noise.
+
+    Returns:
+        The log dimensionless jerk (lower is smoother), or NaN if there is not
+        enough data.
     """
-    # Real implementation would calculate the standard deviation of landmark
-    # positions over the frames of the held pose.
-    return 95 # Dummy score
+    num_frames = len(series)
+    dt = _sample_interval(series)
+    if num_frames < 5 or dt <= 0:
+        return float('nan')
+
+    positions = series.landmarks[..., :2].astype(np.float64)
+    window = _smoothing_window(num_frames, 1.0 / dt, FLOW_SMOOTHING_SECONDS)
+    if smooth and window >= 5:
+        velocity = signal.savgol_filter(positions, window, 3, deriv=1, delta=dt, axis=0, mode='interp')
+        jerk = signal.savgol_filter(positions, window, 3, deriv=3, delta=dt, axis=0, mode='interp')
+        jerk_weights = visibility_weights(series.landmarks, stencil=window)
+    else:
+        velocity = np.gradient(positions, dt, axis=0)
+        jerk = np.diff(positions, n=3, axis=0) / dt ** 3
+        jerk_weights = visibility_weights(series.landmarks, stencil=4)[2:-1]
+    weights = visibility_weights(series.landmarks, stencil=2)
+
+    speed = np.linalg.norm(velocity, axis=-1) * (weights > 0)
+    peak_speed = speed.max(axis=0)
+    path_length = (speed * dt).sum(axis=0)
+    jerk_integral = (np.sum(jerk ** 2, axis=-1) * (jerk_weights > 0)).sum(axis=0) * dt
+
+    duration = (num_frames - 1) * dt  # N samples span N-1 intervals
+    moving = (peak_speed > 0) & (jerk_weights.sum(axis=0) > 0)
+    if not moving.any():
+        return float('nan')
+    dimensionless_jerk = duration ** 3 / peak_speed[moving] ** 2 * jerk_integral[moving]
+    joint_weights = weights.mean(axis=0)[moving] * path_length[moving]
+    if joint_weights.sum() <= 0:
+        return float('nan')
+    return float(np.average(np.log(dimensionless_jerk + 1e-12), weights=joint_weights))
+
+def _linear_score(value: float, best: float, worst: float) -> int:
+    """Maps `best` to 100 and `worst` to 0 linearly, clamped to [0, 100]."""
+    if np.isnan(value):
+        return 0
+    score = 100 * (worst - value) / (worst - best)
+    return int(min(max(score, 0), 100))
+
+@timed("stability_scoring")
+def analyze_stability(landmarks: LandmarkSeries, window_seconds: float = 1.0, smooth: bool = False) -> int:
+    """
+    Scores how still the athlete holds a pose, from landmark jitter.
+
+    Args:
+        landmarks: The landmark series of the held pose.
+        window_seconds: Length of the sliding window for the jitter measurement.
+        smooth: Apply Savitzky-Golay smoothing before measuring.
+
+    Returns:
+        A score from 0 to 100 (0 if there is not enough visible data).
+    """
+    jitter = compute_landmark_jitter(landmarks, window_seconds, smooth)
+    return _linear_score(jitter, 0.0, STABILITY_JITTER_TOLERANCE)
+
+# --- Routine segmentation ---
+
+# Motion energy (visibility-weighted mean joint speed, in torso lengths per
+# second) below which a pose may be held, and above which a held pose ends.
+# The gap between the two is the hysteresis band.
+HOLD_ENERGY_THRESHOLD = 0.15
+MOVE_ENERGY_THRESHOLD = 0.3
+MIN_HOLD_SECONDS = 1.0
+ENERGY_SMOOTHING_SECONDS = 0.2
+
+def _torso_length(landmarks: np.ndarray) -> float:
+    """Shoulder-midpoint to hip-midpoint distance in one frame, or 0 if occluded."""
+    torso = landmarks[[LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP]]
+    if torso[:, 3].min() < VISIBILITY_THRESHOLD:
+        return 0.0
+    return float(np.linalg.norm((torso[0, :2] + torso[1, :2]) / 2 - (torso[2, :2] + torso[3, :2]) / 2))
+
+class RoutineSegmenter:
+    """
+    An online state machine that splits a landmark stream into "Held Pose" and
+    "Transition" phases.
+
+    Frames are fed one at a time with `update`, which returns any phases that
+    ended on that frame, so it works the same on a decoded video or a live camera
+    feed. A hold only starts once motion energy has stayed below the hold
+    threshold for `min_hold_seconds`, and only ends when it rises above the
+    (higher) move threshold, so brief wobbles don't fragment the timeline.
+    """
+
+    def __init__(self, hold_threshold: float = HOLD_ENERGY_THRESHOLD,
+                 move_threshold: float = MOVE_ENERGY_THRESHOLD,
+                 min_hold_seconds: float = MIN_HOLD_SECONDS,
+                 smoothing_seconds: float = ENERGY_SMOOTHING_SECONDS):
+        if move_threshold < hold_threshold:
+            raise ValueError("move_threshold must be at least hold_threshold.")
+        self.hold_threshold = hold_threshold
+        self.move_threshold = move_threshold
+        self.min_hold_seconds = min_hold_seconds
+        self.smoothing_seconds = smoothing_seconds
+
+        self.state = "Transition"
+        self.energy = 0.0
+        self.num_holds = 0
+        self._rows = []           # (timestamp, landmarks, frame index) of the open phase
+        self._hold_start = None   # Row index where a candidate hold began
+        self._previous = None     # (timestamp, landmarks) of the last frame
+        self._measured = False    # Whether the last frame had a motion measurement
+        self._smoothed = None     # Exponentially smoothed (33, 2) joint positions
+        self._scale = 0.0
+
+    def _motion_energy(self, timestamp: float, landmarks: np.ndarray) -> Optional[float]:
+        previous_timestamp, previous = self._previous
+        dt = timestamp - previous_timestamp
+        scale = _torso_length(landmarks) or self._scale
+        self._scale = scale
+        weights = np.minimum(previous[:, 3], landmarks[:, 3])
+        weights = np.where(weights >= VISIBILITY_THRESHOLD, weights, 0.0)
+        if dt <= 0 or scale <= 0 or weights.sum() <= 0:
+            # Nothing to measure on this frame (e.g. no athlete in view).
+            return None
+        # Exponential smoothing with a time constant, so it is frame-rate independent.
+        alpha = 1.0 - np.exp(-dt / self.smoothing_seconds) if self.smoothing_seconds > 0 else 1.0
+        # Speed is measured on smoothed positions; raw frame-to-frame deltas are
+        # dominated by detector jitter, which would keep still poses "moving".
+        step = alpha * (landmarks[:, :2] - self._smoothed)
+        self._smoothed = self._smoothed + step
+        speed = float(np.dot(weights, np.linalg.norm(step, axis=1)) / weights.sum()) / dt / scale
+        return self.energy + alpha * (speed - self.energy)
+
+    def _emit(self, phase_type: str, end: int) -> dict:
+        """Closes the phase made of the first `end` buffered rows."""
+        rows, self._rows = self._rows[:end], self._rows[end:]
+        # Phases share their boundary frame so the timeline has no gaps.
+        end_time = self._rows[0][0] if self._rows else rows[-1][0]
+        if phase_type == "Held Pose":
+            self.num_holds += 1
+            details = f"Pose {self.num_holds}"
+        else:
+            details = "Transition"
+        return {
+            "type": phase_type,
+            "start_time": rows[0][0],
+            "end_time": end_time,
+            "details": details,
+            "landmarks": LandmarkSeries(
+                np.stack([row[1] for row in rows]),
+                np.array([row[0] for row in rows], dtype=np.float64),
+                np.array([row[2] for row in rows], dtype=np.int64),
+            ),
+        }
+
+    def update(self, timestamp: float, landmarks: np.ndarray, frame_index: int = -1) -> List[dict]:
+        """
+        Feeds one frame of (33, 4) landmarks.
+
+        Returns:
+            The phases (usually none) that ended on this frame.
+        """
+        energy = None
+        measured_before = self._measured
+        if self._previous is None:
+            self._smoothed = landmarks[:, :2].astype(np.float64)
+        else:
+            energy = self._motion_energy(timestamp, landmarks)
+        if energy is not None:
+            self.energy = energy
+        self._measured = energy is not None
+        self._previous = (timestamp, landmarks)
+        self._rows.append((timestamp, landmarks, frame_index))
+
+        phases = []
+        if self.state == "Transition":
+            # Frames with nothing measurable never start or extend a hold, but an
+            # established hold survives a brief occlusion.
+            if energy is not None and self.energy < self.hold_threshold:
+                if self._hold_start is None:
+                    # Energy measures the step from the previous frame, so when that
+                    # frame had no measurement of its own (e.g. the first frame of
+                    # the clip) it is the real start of the still stretch.
+                    self._hold_start = len(self._rows) - (1 if measured_before else 2)
+                elif timestamp - self._rows[self._hold_start][0] >= self.min_hold_seconds:
+                    if self._hold_start > 0:
+                        phases.append(self._emit("Transition", self._hold_start))
+                    self.state = "Held Pose"
+                    self._hold_start = None
+            else:
+                self._hold_start = None
+        elif self.energy > self.move_threshold:
+            # The hold ended on the previous frame; this frame starts the transition.
+            phases.append(self._emit("Held Pose", len(self._rows) - 1))
+            self.state = "Transition"
+        return phases
+
+    def finish(self) -> List[dict]:
+        """
+        Closes the open phase at the end of the stream.
+        """
+        phases = []
+        if self._rows:
+            if self.state == "Transition" and self._hold_start is not None and \
+                    self._rows[-1][0] - self._rows[self._hold_start][0] >= self.min_hold_seconds:
+                if self._hold_start > 0:
+                    phases.append(self._emit("Transition", self._hold_start))
+                self.state = "Held Pose"
+            phases.append(self._emit(self.state, len(self._rows)))
+        self._hold_start = None
+        return phases
 
 def analyze_stage_presence(video_frames) -> dict:
     """
@@ -68,9 +409,17 @@ def analyze_stage_presence(video_frames) -> dict:
         "overall_presence_score": 85
     }
 
-def analyze_flow(video_frames, landmarks) -> int:
+@timed("flow_scoring")
+def analyze_flow(landmarks: LandmarkSeries, smooth: bool = True) -> int:
     """
-    [PLACEHOLDER] Analyzes the smoothness of transitions between poses.
+    Scores the smoothness of a transition between poses, from kinematic jerk.
+
+    Args:
+        landmarks: The landmark series of the transition.
+        smooth: Differentiate with a Savitzky-Golay filter.
+
+    Returns:
+        A score from 0 to 100 (0 if there is not enough visible data).
     """
-    # Real implementation would calculate the kinematic jerk of key landmarks.
-    return 88 # Dummy score
+    log_jerk = compute_dimensionless_jerk(landmarks, smooth)
+    return _linear_score(log_jerk, FLOW_LOG_JERK_IDEAL, FLOW_LOG_JERK_WORST)
@@ -0,0 +1,478 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, Future
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from ..preload import preload_backends
+from ..preprocessing.image_preprocessor import DEFAULT_QUALITY, preprocess_for_static_analysis
+from ..preprocessing.video_decoder import _COPY_CHUNK_SIZE, VideoSource, get_video_info
+from ..preprocessing.video_landmarks import LandmarkSeries
+from ..utils.metrics import collect_spans, increment, summarize_spans
+from ..utils.parallel import _set_onnx_threads, create_process_pool
+from ..utils.resources import cache_resource
+from ..utils.result_cache import content_key
+from .dynamic_analyzer import (
+    DEFAULT_ROUTINE_FPS,
+    analyze_flow,
+    analyze_stability,
+    iter_routine_phases,
+)
+from .keyframes import DEFAULT_MAX_KEYFRAMES, analyze_held_pose
+from .static_analyzer import DEFAULT_DIVISION, analyze_static_pose
+
+# Heavy jobs run at most this many at a time (one per worker process), which
+# bounds peak memory: each worker holds its own rembg and MediaPipe models.
+DEFAULT_MAX_WORKERS = 2
+# Submissions beyond this many queued/running jobs are rejected.
+DEFAULT_MAX_PENDING = 16
+# Finished jobs (and their results) are kept this long, and at most this many.
+DEFAULT_RESULT_TTL_SECONDS = 15 * 60
+DEFAULT_MAX_RETAINED = 64
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a job is submitted while the queue is at its pending limit."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its running job has been cancelled."""
+
+
+class JobStatus(NamedTuple):
+    """A snapshot of a job, safe to hand to the UI."""
+    job_id: str
+    kind: str                  # "image", "video" or "pose"
+    state: str                 # One of queued, running, done, failed, cancelled
+    progress: float            # 0.0 - 1.0
+    message: str
+    partial_results: List[Any] # Results streamed before the job finished (e.g. routine phases)
+    result: Any                # The final result once the job is done
+    error: Optional[str]
+    submitted_at: float
+    finished_at: Optional[float]
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+
+# --- Worker side ---
+
+_progress_queue = None
+_cancelled_jobs = None
+
+
+def _init_job_worker(progress_queue, cancelled_jobs, onnx_threads: Optional[int],
+                     warm_up_models: bool) -> None:
+    """
+    Process-pool initializer: connects the worker to the queue's progress channel
+    and, if asked, starts loading the models in the background.
+    """
+    global _progress_queue, _cancelled_jobs
+    _set_onnx_threads(onnx_threads)
+    _progress_queue = progress_queue
+    _cancelled_jobs = cancelled_jobs
+    if warm_up_models:
+        preload_backends(warm_up_models=True, background=True)
+
+
+def _start_worker() -> None:
+    """No-op task used to spawn workers ahead of the first job."""
+
+
+def report_progress(job_id: str, progress: float, message: str = "", partial_result: Any = None) -> None:
+    """
+    Called by job functions at natural checkpoints. Sends progress (and optionally
+    one partial result) to the app, and raises JobCancelled if the job was cancelled.
+    Does nothing outside a job worker, so job functions can also run inline.
+    """
+    if _cancelled_jobs is not None and job_id in _cancelled_jobs:
+        raise JobCancelled(job_id)
+    if _progress_queue is not None:
+        _progress_queue.put((job_id, progress, message, partial_result))
+
+
+def run_image_job(job_id: str, image_bytes: bytes, division: str = DEFAULT_DIVISION,
+                  quality: str = DEFAULT_QUALITY) -> dict:
+    """
+    Runs the full static analysis on one image.
+
+    Returns:
+        A dictionary with the annotated image, the analyze_static_pose results
+        (None when no pose was detected) and the time spent in each stage.
+    """
+    with collect_spans() as spans:
+        report_progress(job_id, 0.05, "Removing background and detecting pose...")
+        annotated_image, pose_landmarks = preprocess_for_static_analysis(image_bytes, quality=quality)
+        report_progress(job_id, 0.8, "Scoring...")
+        results = None
+        if pose_landmarks:
+            results = analyze_static_pose(annotated_image, pose_landmarks,
+                                          cache_key=content_key(image_bytes, quality), division=division)
+    return {"annotated_image": annotated_image, "results": results, "timings": summarize_spans(spans)}
+
+
+def run_video_job(job_id: str, video_path: str, target_fps: float = DEFAULT_ROUTINE_FPS) -> List[dict]:
+    """
+    Deconstructs a routine and scores each phase. Every phase is streamed to the
+    app as a partial result as soon as it is detected.
+
+    Returns:
+        The list of phase dictionaries, each with a "score" (stability for held
+        poses, flow for transitions).
+    """
+    duration = get_video_info(video_path).duration
+    report_progress(job_id, 0.0, "Deconstructing routine...")
+    phases = []
+    for phase in iter_routine_phases(video_path, target_fps):
+        if phase['type'] == 'Held Pose':
+            phase['score'] = analyze_stability(phase['landmarks'])
+        else:
+            phase['score'] = analyze_flow(phase['landmarks'])
+        phases.append(phase)
+        progress = min(phase['end_time'] / duration, 1.0) if duration > 0 else 0.0
+        report_progress(job_id, progress, f"Analyzed {phase['end_time']:.1f}s of the routine", phase)
+    return phases
+
+
+def run_pose_job(job_id: str, video_path: str, series: LandmarkSeries, division: str = DEFAULT_DIVISION,
+                 quality: str = DEFAULT_QUALITY, max_keyframes: int = DEFAULT_MAX_KEYFRAMES) -> dict:
+    """
+    Runs the full static analysis on one held pose of a routine, using only its
+    sharpest, stillest keyframes.
+
+    Returns:
+        The analyze_held_pose dictionary (annotated image, aggregated results and
+        keyframe summaries), plus the time spent in each stage.
+    """
+    with collect_spans() as spans:
+        report_progress(job_id, 0.05, "Selecting keyframes...")
+        result = analyze_held_pose(video_path, series, division, quality, max_keyframes)
+    result["timings"] = summarize_spans(spans)
+    return result
+
+
+# --- App side ---
+
+class _Job:
+    def __init__(self, job_id: str, kind: str):
+        self.job_id = job_id
+        self.kind = kind
+        self.state = QUEUED
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.partial_results: List[Any] = []
+        self.result = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+        self.executor = None  # The pool the job was submitted to
+        self.temp_path: Optional[str] = None
+
+    def snapshot(self) -> JobStatus:
+        return JobStatus(self.job_id, self.kind, self.state, self.progress, self.message,
+                         list(self.partial_results), self.result, self.error,
+                         self.submitted_at, self.finished_at)
+
+
+class JobQueue:
+    """
+    A local queue that runs analysis jobs in worker processes, so the Streamlit
+    script only submits work and polls for it instead of blocking on inference.
+
+    Each job gets an ID, reports progress (and partial results) from the worker,
+    can be cancelled, and keeps its result for a while after it finishes. The
+    number of workers caps how many heavy jobs run at once; queued jobs wait for
+    a free worker, and submissions beyond `max_pending` are rejected.
+
+    Cancellation is immediate for queued jobs and cooperative for running ones:
+    the job stops at its next progress checkpoint.
+
+    With `warm_up_models`, every worker is started right away and loads its models
+    in the background, so the first job doesn't pay for the cold start.
+
+    A worker that dies (OOM-killed, or a native crash in mediapipe/onnxruntime)
+    breaks the whole process pool and fails every job it held. The pool is then
+    replaced, so later submissions run on fresh workers.
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_MAX_WORKERS, max_pending: int = DEFAULT_MAX_PENDING,
+                 result_ttl_seconds: float = DEFAULT_RESULT_TTL_SECONDS,
+                 max_retained: int = DEFAULT_MAX_RETAINED, warm_up_models: bool = False):
+        if max_workers < 1:
+            raise ValueError(f"max_workers must be at least 1, got {max_workers}.")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_retained = max_retained
+        self._jobs: Dict[str, _Job] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._cancelled_jobs = self._manager.dict()
+        self._progress_queue = context.Queue()
+        self._warm_up_models = warm_up_models
+        self._executor = self._create_executor()
+        self._listener = threading.Thread(target=self._listen_for_progress,
+                                          name="poseperfect-job-progress", daemon=True)
+        self._listener.start()
+
+    def _create_executor(self):
+        onnx_threads = max(1, (os.cpu_count() or 1) // self.max_workers)
+        executor = create_process_pool(self.max_workers, _init_job_worker,
+                                       (self._progress_queue, self._cancelled_jobs, onnx_threads,
+                                        self._warm_up_models))
+        if self._warm_up_models:
+            # Each submission that finds no idle worker spawns a new one.
+            for _ in range(self.max_workers):
+                executor.submit(_start_worker)
+        return executor
+
+    def _replace_broken_executor(self, broken) -> None:
+        """Swaps in a fresh pool for `broken`, unless that was already done."""
+        with self._lock:
+            replaced = self._swap_executor_locked(broken)
+        if replaced:
+            # Not waiting: this may run on the broken pool's own management thread.
+            broken.shutdown(wait=False)
+
+    def _swap_executor_locked(self, broken) -> bool:
+        if self._closed or self._executor is not broken:
+            return False
+        self._executor = self._create_executor()
+        return True
+
+    # --- Submission ---
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args: Any) -> str:
+        """
+        Submits `fn(job_id, *args)` to run in a worker process.
+
+        Returns:
+            The new job's ID.
+        """
+        return self._submit(kind, fn, args)
+
+    def submit_image(self, image_bytes: bytes, division: str = DEFAULT_DIVISION,
+                     quality: str = DEFAULT_QUALITY) -> str:
+        """Queues the full static analysis of an encoded image."""
+        return self._submit("image", run_image_job, (image_bytes, division, quality))
+
+    def submit_video(self, video_source: VideoSource, target_fps: float = DEFAULT_ROUTINE_FPS) -> str:
+        """
+        Queues the deconstruction of a routine video. Uploads and bytes are spooled
+        to a temporary file first, so only its path is sent to the worker.
+        """
+        return self._submit_with_video("video", run_video_job, video_source, (target_fps,))
+
+    def submit_pose(self, video_source: VideoSource, series: LandmarkSeries, division: str = DEFAULT_DIVISION,
+                    quality: str = DEFAULT_QUALITY) -> str:
+        """
+        Queues the full static analysis of one held pose of a routine video, given
+        the pose's landmark series (a phase's "landmarks").
+        """
+        return self._submit_with_video("pose", run_pose_job, video_source, (series, division, quality))
+
+    def _submit_with_video(self, kind: str, fn: Callable[..., Any], video_source: VideoSource,
+                           args: tuple) -> str:
+        """Submits `fn(job_id, video_path, *args)`, spooling the video to a temporary file if needed."""
+        if isinstance(video_source, (str, os.PathLike)):
+            return self._submit(kind, fn, (os.fspath(video_source),) + args)
+
+        temp_file = tempfile.NamedTemporaryFile(suffix=".video", delete=False)
+        with temp_file:
+            if isinstance(video_source, (bytes, bytearray, memoryview)):
+                temp_file.write(video_source)
+            else:
+                if hasattr(video_source, "seek"):
+                    video_source.seek(0)
+                shutil.copyfileobj(video_source, temp_file, _COPY_CHUNK_SIZE)
+        try:
+            return self._submit(kind, fn, (temp_file.name,) + args, temp_file.name)
+        except Exception:
+            os.remove(temp_file.name)
+            raise
+
+    def _submit(self, kind: str, fn: Callable[..., Any], args: tuple, temp_path: Optional[str] = None) -> str:
+        self._purge_finished()
+        job = _Job(uuid.uuid4().hex, kind)
+        job.temp_path = temp_path
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The job queue has been shut down.")
+            pending = sum(1 for j in self._jobs.values() if j.state not in FINISHED_STATES)
+            if pending >= self.max_pending:
+                raise QueueFullError(f"Too many pending jobs ({pending}); try again shortly.")
+            try:
+                job.future = self._executor.submit(fn, job.job_id, *args)
+            except BrokenProcessPool:
+                # A worker died since the last job finished; retry once on a fresh pool.
+                broken = self._executor
+                self._swap_executor_locked(broken)
+                broken.shutdown(wait=False)
+                job.future = self._executor.submit(fn, job.job_id, *args)
+            # Only registered once submitted, so a failed submission leaves no job behind.
+            job.executor = self._executor
+            self._jobs[job.job_id] = job
+        job.future.add_done_callback(lambda future, job=job: self._on_done(job, future))
+        return job.job_id
+
+    # --- Polling and control ---
+
+    def status(self, job_id: str) -> Optional[JobStatus]:
+        """
+        Returns a snapshot of a job, or None if it is unknown or has expired.
+        """
+        self._purge_finished()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.snapshot() if job is not None else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[JobStatus]:
+        """
+        Blocks until a job finishes (or the timeout passes) and returns its status.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        try:
+            job.future.exception(timeout=timeout)
+        except (CancelledError, FutureTimeoutError):
+            pass
+        # The done callback may still be running; take the lock to see its result.
+        with self._lock:
+            return job.snapshot()
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a job. Returns False if it is unknown or already finished.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+        if not job.future.cancel():
+            # Already running: flag it so the worker stops at its next checkpoint.
+            self._cancelled_jobs[job_id] = True
+        return True
+
+    def jobs(self) -> List[JobStatus]:
+        """Snapshots of every retained job, oldest first."""
+        self._purge_finished()
+        with self._lock:
+            return [job.snapshot() for job in self._jobs.values()]
+
+    def shutdown(self, cancel_pending: bool = True) -> None:
+        """
+        Stops the workers. Queued jobs are cancelled unless `cancel_pending` is False,
+        in which case they run to completion first.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            running = [j.job_id for j in self._jobs.values() if j.state == RUNNING]
+        if cancel_pending:
+            for job_id in running:
+                self._cancelled_jobs[job_id] = True
+        self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+        self._progress_queue.put(None)
+        self._listener.join()
+        self._manager.shutdown()
+
+    # --- Internals ---
+
+    def _listen_for_progress(self) -> None:
+        while True:
+            message = self._progress_queue.get()
+            if message is None:
+                return
+            job_id, progress, text, partial_result = message
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job.state in FINISHED_STATES:
+                    continue
+                job.state = RUNNING
+                job.progress = progress
+                job.message = text
+                if partial_result is not None:
+                    job.partial_results.append(partial_result)
+
+    def _on_done(self, job: _Job, future: Future) -> None:
+        if future.cancelled():
+            state, result, error = CANCELLED, None, None
+        elif isinstance(future.exception(), JobCancelled):
+            state, result, error = CANCELLED, None, None
+        elif isinstance(future.exception(), BrokenProcessPool):
+            state, result, error = FAILED, None, ("BrokenProcessPool: the worker process running this job "
+                                                  "died (e.g. out of memory)")
+        elif future.exception() is not None:
+            exception = future.exception()
+            state, result, error = FAILED, None, f"{type(exception).__name__}: {exception}"
+        else:
+            state, result, error = DONE, future.result(), None
+
+        # Progress still in the pipe is dropped once the job is finished; the final
+        # result supersedes any partial results.
+        with self._lock:
+            job.state = state
+            job.result = result
+            job.error = error
+            job.finished_at = time.time()
+            if state == DONE:
+                job.progress = 1.0
+                job.message = "Done"
+            elif state == CANCELLED:
+                job.message = "Cancelled"
+            else:
+                job.message = "Failed"
+        increment("jobs_total", kind=job.kind, state=state)
+        try:
+            self._cancelled_jobs.pop(job.job_id, None)
+        except (OSError, EOFError):
+            pass  # The manager is already gone during shutdown.
+        if job.temp_path and os.path.exists(job.temp_path):
+            os.remove(job.temp_path)
+        if state == FAILED and error.startswith("BrokenProcessPool"):
+            self._replace_broken_executor(job.executor)
+
+    def _purge_finished(self) -> None:
+        """Drops finished jobs past their retention time, and the oldest beyond max_retained."""
+        now = time.time()
+        with self._lock:
+            finished = [j for j in self._jobs.values() if j.state in FINISHED_STATES]
+            finished.sort(key=lambda j: j.finished_at)
+            excess = len(finished) - self.max_retained
+            for i, job in enumerate(finished):
+                if i < excess or now - job.finished_at > self.result_ttl_seconds:
+                    del self._jobs[job.job_id]
+
+
+# --- Process-wide shared queue ---
+
+@cache_resource(pinned=True, closer=JobQueue.shutdown)
+def get_job_queue(max_workers: int = DEFAULT_MAX_WORKERS, warm_up_models: bool = False) -> JobQueue:
+    """
+    Returns the process-wide job queue, shared by every Streamlit session so the
+    worker cap applies to the whole server.
+    """
+    return JobQueue(max_workers, warm_up_models=warm_up_models)
@@ -0,0 +1,255 @@
+import numpy as np
+from typing import List, NamedTuple, Sequence, Union
+
+from ..preprocessing.image_preprocessor import DEFAULT_QUALITY, preprocess_batch_for_static_analysis
+from ..preprocessing.video_decoder import VideoSource, read_video_frames
+from ..preprocessing.video_landmarks import LandmarkSeries
+from ..utils.lazy import lazy_import
+from ..utils.metrics import span, timed
+from .dynamic_analyzer import body_scale, visibility_weights
+from .static_analyzer import DEFAULT_DIVISION, analyze_static_pose, calculate_total_package_score
+
+cv2 = lazy_import("cv2")
+
+# A held pose is scored on at most this many keyframes, so the cost of the full
+# static pipeline (rembg + the largest pose model) is per pose, not per frame.
+DEFAULT_MAX_KEYFRAMES = 3
+
+# Only the stillest frames are decoded at full resolution and checked for
+# sharpness: this many candidates per keyframe.
+CANDIDATES_PER_KEYFRAME = 4
+
+# Keyframes are at least this far apart, so they sample the whole hold rather
+# than one instant of it.
+MIN_KEYFRAME_SPACING_SECONDS = 0.5
+
+# Sharpness is measured at this size, which is cheap and keeps the Laplacian
+# variance comparable between frames of different resolutions.
+SHARPNESS_MAX_DIMENSION = 480
+
+# Landmark speed (torso lengths per second) at which a frame's stability weight
+# halves. A still frame has weight 1.
+MOTION_HALF_WEIGHT = 0.1
+
+JPEG_QUALITY = 95
+
+
+class Keyframe(NamedTuple):
+    """A frame chosen to represent a held pose."""
+    index: int          # Frame index in the source video
+    timestamp: float    # Seconds from the start of the video
+    image: np.ndarray   # Full-resolution RGB image
+    sharpness: float    # Variance of the Laplacian
+    motion: float       # Landmark speed around the frame, in torso lengths per second
+    score: float        # Sharpness weighted by stability; higher is better
+
+
+# --- Frame quality metrics ---
+
+def frame_sharpness(image: np.ndarray) -> float:
+    """
+    Measures focus and motion blur as the variance of the Laplacian of the
+    grayscale image (higher is sharper).
+    """
+    height, width = image.shape[:2]
+    scale = SHARPNESS_MAX_DIMENSION / max(height, width)
+    if scale < 1.0:
+        new_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+        image = cv2.resize(image, new_size, interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+def landmark_motion(series: LandmarkSeries) -> np.ndarray:
+    """
+    Measures how fast the athlete is moving at each frame of a series.
+
+    Each joint's displacement to the neighbouring frames is weighted by
+    visibility and normalized by torso length, then averaged over joints and
+    over the steps into and out of the frame.
+
+    Returns:
+        A (frames,) array of speeds in torso lengths per second; inf where the
+        pose was not visible.
+    """
+    num_frames = len(series)
+    motion = np.full(num_frames, np.inf)
+    if num_frames < 2:
+        return motion
+    weights = visibility_weights(series.landmarks)
+    scale = body_scale(series.landmarks, weights)
+    dt = np.diff(series.timestamps)
+    if scale <= 0 or not (dt > 0).all():
+        return motion
+
+    positions = series.landmarks[..., :2].astype(np.float64)
+    step_weights = np.minimum(weights[1:], weights[:-1])
+    step_distance = np.linalg.norm(np.diff(positions, axis=0), axis=-1)
+    total_weight = step_weights.sum(axis=1)
+    step_speed = np.full(num_frames - 1, np.inf)
+    np.divide((step_weights * step_distance).sum(axis=1), total_weight * dt * scale,
+              out=step_speed, where=total_weight > 0)
+
+    padded = np.concatenate([step_speed[:1], step_speed, step_speed[-1:]])
+    return (padded[:-1] + padded[1:]) / 2
+
+# --- Keyframe selection ---
+
+def _spaced_picks(order: Sequence[int], timestamps: np.ndarray, count: int, min_spacing: float) -> List[int]:
+    """Takes items in `order`, skipping any closer than `min_spacing` to one already taken."""
+    picks: List[int] = []
+    for i in order:
+        if all(abs(timestamps[i] - timestamps[j]) >= min_spacing for j in picks):
+            picks.append(i)
+            if len(picks) == count:
+                break
+    return picks
+
+@timed("keyframe_selection")
+def select_keyframes(video_source: VideoSource, series: LandmarkSeries,
+                     max_keyframes: int = DEFAULT_MAX_KEYFRAMES,
+                     min_spacing: float = MIN_KEYFRAME_SPACING_SECONDS) -> List[Keyframe]:
+    """
+    Picks the sharpest, stillest frames of a held pose.
+
+    The landmark series already gives each frame's motion for free, so only the
+    stillest candidates are decoded (at full resolution) and measured for
+    sharpness. Candidates are ranked by sharpness weighted by stability, and
+    keyframes are kept at least `min_spacing` seconds apart.
+
+    Args:
+        video_source: The routine video the series was extracted from.
+        series: The landmark series of the held pose.
+        max_keyframes: The most keyframes to return.
+        min_spacing: Minimum time between keyframes, in seconds.
+
+    Returns:
+        Up to `max_keyframes` Keyframes, in time order.
+    """
+    if len(series) == 0 or max_keyframes < 1:
+        return []
+
+    # Step 1: Shortlist the stillest frames
+    motion = landmark_motion(series)
+    if np.isfinite(motion).any():
+        order = np.argsort(motion, kind="stable")
+        order = order[np.isfinite(motion[order])]
+    else:
+        # No pose was tracked; fall back to the frames nearest the middle of the hold.
+        order = np.argsort(np.abs(np.arange(len(series)) - (len(series) - 1) / 2), kind="stable")
+    candidates = order[:max_keyframes * CANDIDATES_PER_KEYFRAME]
+
+    # Step 2: Decode only the candidates and measure their sharpness
+    positions = {int(series.frame_indices[i]): i for i in candidates}
+    scored = []
+    for frame in read_video_frames(video_source, positions):
+        i = positions[frame.index]
+        sharpness = frame_sharpness(frame.image)
+        stability = 1.0 / (1.0 + motion[i] / MOTION_HALF_WEIGHT) if np.isfinite(motion[i]) else 1.0
+        scored.append(Keyframe(frame.index, float(series.timestamps[i]), frame.image, sharpness,
+                               float(motion[i]), sharpness * stability))
+
+    # Step 3: Keep the best, spaced apart
+    timestamps = np.array([keyframe.timestamp for keyframe in scored])
+    order = sorted(range(len(scored)), key=lambda k: scored[k].score, reverse=True)
+    picks = _spaced_picks(order, timestamps, max_keyframes, min_spacing)
+    return sorted((scored[k] for k in picks), key=lambda keyframe: keyframe.timestamp)
+
+# --- Held pose analysis ---
+
+def _encode_frame(image: np.ndarray) -> bytes:
+    """Encodes an RGB frame as JPEG bytes, the input of the static pipeline."""
+    ok, encoded = cv2.imencode(".jpg", cv2.cvtColor(image, cv2.COLOR_RGB2BGR),
+                               [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+    if not ok:
+        raise ValueError("Could not encode the video frame.")
+    return encoded.tobytes()
+
+def _median_score(values: Sequence[float], like: Union[int, float]) -> Union[int, float]:
+    """The median of `values`, rounded to an int when `like` (the first frame's value) is one."""
+    median = float(np.median(values))
+    return int(round(median)) if isinstance(like, (int, np.integer)) else median
+
+def aggregate_static_results(results: Sequence[dict], division: str = DEFAULT_DIVISION) -> dict:
+    """
+    Combines the analyze_static_pose results of several frames of one pose.
+
+    Every score (and every muscularity and conditioning entry) is the median over
+    the frames, so one badly detected frame cannot drag the pose down. The Total
+    Package Score is recomputed from the combined category scores.
+
+    Returns:
+        A dictionary in the same format as analyze_static_pose.
+    """
+    first = results[0]
+    combined = {
+        "v_taper_ratio": _median_score([r["v_taper_ratio"] for r in results], first["v_taper_ratio"]),
+        "v_taper_score": _median_score([r["v_taper_score"] for r in results], first["v_taper_score"]),
+    }
+    for category in ("muscularity", "conditioning"):
+        combined[category] = {key: _median_score([r[category][key] for r in results], value)
+                              for key, value in first[category].items()}
+    combined["total_score"] = calculate_total_package_score(
+        combined["v_taper_score"],
+        combined["muscularity"]["Overall Fullness"],
+        combined["conditioning"]["Overall Conditioning"],
+        division
+    )
+    return combined
+
+def analyze_held_pose(video_source: VideoSource, series: LandmarkSeries, division: str = DEFAULT_DIVISION,
+                      quality: str = DEFAULT_QUALITY, max_keyframes: int = DEFAULT_MAX_KEYFRAMES) -> dict:
+    """
+    Runs the full static analysis on a held pose from a routine video.
+
+    The full pipeline only runs on a few keyframes (see select_keyframes), as one
+    batch, and their scores are aggregated over the pose.
+
+    Args:
+        video_source: The routine video.
+        series: The landmark series of the held pose (a phase's "landmarks").
+        division: The competition division used for the Total Package Score.
+        quality: A key of QUALITY_PRESETS.
+        max_keyframes: The most frames to analyze.
+
+    Returns:
+        A dictionary with the annotated image of the best keyframe, the aggregated
+        results (None when no pose was detected on any keyframe), and "keyframes":
+        a summary (timestamp, sharpness, motion, total score) of each keyframe.
+    """
+    keyframes = select_keyframes(video_source, series, max_keyframes)
+    if not keyframes:
+        raise ValueError("Could not decode any frames of this pose.")
+
+    with span("keyframe_encode"):
+        encoded = [_encode_frame(keyframe.image) for keyframe in keyframes]
+    # Frames are unique to this video, so there is nothing to gain from the result cache.
+    preprocessed = preprocess_batch_for_static_analysis(encoded, use_cache=False, return_exceptions=True,
+                                                        quality=quality)
+    errors = [item for item in preprocessed if isinstance(item, Exception)]
+    if len(errors) == len(preprocessed):
+        raise errors[0]
+
+    summaries = []
+    scored = []
+    for keyframe, item in zip(keyframes, preprocessed):
+        results = None
+        if not isinstance(item, Exception) and item[1]:
+            annotated_image, pose_landmarks = item
+            results = analyze_static_pose(annotated_image, pose_landmarks, division=division)
+            scored.append((keyframe, annotated_image, results))
+        summaries.append({
+            "timestamp": round(keyframe.timestamp, 2),
+            "frame_index": keyframe.index,
+            "sharpness": round(keyframe.sharpness, 1),
+            "motion": round(keyframe.motion, 3),
+            "total_score": results["total_score"] if results else None,
+        })
+
+    if not scored:
+        return {"annotated_image": None, "results": None, "keyframes": summaries}
+    best_image = max(scored, key=lambda s: s[0].score)[1]
+    return {
+        "annotated_image": best_image,
+        "results": aggregate_static_results([s[2] for s in scored], division),
+        "keyframes": summaries,
+    }
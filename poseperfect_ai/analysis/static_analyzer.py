@@ -1,8 +1,28 @@
 
+import math
 import numpy as np
-from mediapipe.framework.formats import landmark_pb2
+from typing import Any, Callable, Optional
 
-def calculate_v_taper_ratio(landmarks: landmark_pb2.NormalizedLandmarkList, image_width: int, image_height: int) -> float:
+from ..utils.lazy import lazy_import
+from ..utils.metrics import timed
+from ..utils.resources import get_resource_manager
+from ..utils.result_cache import content_key, get_result_cache
+
+# Only needed for type hints; resolved lazily so importing this module is cheap.
+landmark_pb2 = lazy_import("mediapipe.framework.formats.landmark_pb2")
+
+# MediaPipe landmark indices
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_HIP = 23
+RIGHT_HIP = 24
+
+# The "golden ratio" of 1.618 is often considered an aesthetic ideal; a ratio of
+# 1.0 means the shoulders and waist are the same width.
+V_TAPER_IDEAL_RATIO = 1.618
+V_TAPER_BASELINE_RATIO = 1.0
+
+def calculate_v_taper_ratio(landmarks: "landmark_pb2.NormalizedLandmarkList", image_width: int, image_height: int) -> float:
     """
     Calculates the V-Taper (shoulder-to-waist) ratio from pose landmarks.
 
@@ -17,12 +37,6 @@ def calculate_v_taper_ratio(landmarks: landmark_pb2.NormalizedLandmarkList, imag
     if not landmarks:
         return 0.0
 
-    # MediaPipe landmark indices
-    LEFT_SHOULDER = 11
-    RIGHT_SHOULDER = 12
-    LEFT_HIP = 23
-    RIGHT_HIP = 24
-
     # Get landmark coordinates
     left_shoulder_pt = landmarks.landmark[LEFT_SHOULDER]
     right_shoulder_pt = landmarks.landmark[RIGHT_SHOULDER]
@@ -70,12 +84,8 @@ def get_v_taper_score(v_taper_ratio: float) -> int:
     if v_taper_ratio == 0.0:
         return 0
 
-    # Define the ideal and a baseline ratio
-    ideal_ratio = 1.618
-    baseline_ratio = 1.0  # Shoulders and waist are the same width
-
     # Calculate score based on a linear scale up to the ideal
-    score = 100 * (v_taper_ratio - baseline_ratio) / (ideal_ratio - baseline_ratio)
+    score = 100 * (v_taper_ratio - V_TAPER_BASELINE_RATIO) / (V_TAPER_IDEAL_RATIO - V_TAPER_BASELINE_RATIO)
 
     # Clamp the score to a maximum of 100, but allow for a minimum of 0
     score = min(max(score, 0), 100)
@@ -84,6 +94,15 @@ def get_v_taper_score(v_taper_ratio: float) -> int:
 
 # --- PLACEHOLDER FUNCTIONS for the Anatomist Module ---
 
+def get_anatomist_model(division: str, loader: Callable[[str], Any], size_bytes: Optional[int] = None) -> Any:
+    """
+    Returns the Anatomist model for a division, loaded once per process and shared
+    by every session. Division models are not pinned: when several divisions are
+    loaded and the POSEPERFECT_MODEL_MEMORY_MB budget is exceeded, the least
+    recently used ones are evicted (and reloaded with `loader` on next use).
+    """
+    return get_resource_manager().get(f"anatomist:{division}", lambda: loader(division), size_bytes=size_bytes)
+
 def analyze_muscularity(image: np.ndarray) -> dict:
     """
     [PLACEHOLDER] Analyzes muscle fullness from a segmented image.
@@ -111,7 +130,23 @@ def analyze_conditioning(image: np.ndarray) -> dict:
 
 # --- HOLISTIC SCORING ---
 
-def calculate_total_package_score(v_taper_score: int, muscularity_score: int, conditioning_score: int) -> int:
+DEFAULT_DIVISION = "Men's Physique"
+
+# Weights for [symmetry/V-Taper, muscularity, conditioning] per division.
+# These are starting points to be tuned against judged results.
+DIVISION_WEIGHTS = {
+    # Symmetry > Conditioning = Muscularity
+    "Men's Physique": (0.4, 0.3, 0.3),
+    "Classic Physique": (0.35, 0.35, 0.3),
+    "Men's Bodybuilding": (0.25, 0.4, 0.35),
+    "Bikini": (0.45, 0.2, 0.35),
+    "Wellness": (0.3, 0.4, 0.3),
+    "Figure": (0.4, 0.3, 0.3),
+    "Women's Physique": (0.3, 0.35, 0.35),
+}
+
+def calculate_total_package_score(v_taper_score: int, muscularity_score: int, conditioning_score: int,
+                                  division: str = DEFAULT_DIVISION) -> int:
     """
     Calculates a holistic "Total Package Score" that penalizes imbalances.
 
@@ -119,25 +154,148 @@ def calculate_total_package_score(v_taper_score: int, muscularity_score: int, co
         v_taper_score: The score for symmetry/V-Taper.
         muscularity_score: The overall score for muscle fullness.
         conditioning_score: The overall score for conditioning.
+        division: The competition division, which selects the category weights.
 
     Returns:
         The final Total Package Score.
     """
-    scores = np.array([v_taper_score, muscularity_score, conditioning_score])
-    
-    # Define weights for each category (can be tuned per division)
-    # For Men's Physique: Symmetry > Conditioning > Muscularity
-    weights = np.array([0.4, 0.3, 0.3])
-    
+    if division not in DIVISION_WEIGHTS:
+        raise ValueError(f"Unknown division '{division}'. Expected one of: {', '.join(DIVISION_WEIGHTS)}")
+    # Plain Python for one athlete: the array kernel's setup costs far more than
+    # the arithmetic. The operations follow calculate_total_package_scores in
+    # order, so both give the same score.
+    scores = (float(v_taper_score), float(muscularity_score), float(conditioning_score))
+    weights = DIVISION_WEIGHTS[division]
+
+    # Calculate the weighted average
+    weighted_average = sum(s * w for s, w in zip(scores, weights)) / sum(weights)
+
+    # Calculate a penalty based on the (population) standard deviation of the scores
+    mean = sum(scores) / len(scores)
+    std_dev = math.sqrt(sum((s - mean) ** 2 for s in scores) / len(scores))
+    penalty_factor = 1 - (std_dev / 100)
+
+    # Apply the penalty, truncating like the kernel's integer cast
+    return int(weighted_average * penalty_factor)
+
+# --- VECTORIZED SCORING KERNELS ---
+# Array-native versions of the scorers above, for batches of images or every
+# frame of a video. Landmarks are (N, 33, 4) arrays of x, y, z, visibility, as
+# produced by `landmarks_to_array` / `LandmarkSeries`.
+
+def calculate_v_taper_ratios(landmarks: np.ndarray, image_width=1, image_height=1) -> np.ndarray:
+    """
+    Calculates the V-Taper ratio for every landmark set in a batch.
+
+    Args:
+        landmarks: An (N, 33, 4) array of normalized landmarks.
+        image_width: The image width, as a scalar or an (N,) array.
+        image_height: The image height, as a scalar or an (N,) array.
+
+    Returns:
+        An (N,) float array of ratios, 0.0 where landmarks are not sufficient.
+    """
+    landmarks = np.asarray(landmarks, dtype=np.float64)
+    if landmarks.ndim == 2:
+        landmarks = landmarks[None]
+    torso = landmarks[:, [LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_HIP, RIGHT_HIP]]
+
+    visible = (torso[..., 3] > 0.5).all(axis=1)
+    pixel_x = torso[..., 0] * np.reshape(image_width, (-1, 1))
+    shoulder_width = np.abs(pixel_x[:, 0] - pixel_x[:, 1])
+    hip_width = np.abs(pixel_x[:, 2] - pixel_x[:, 3])
+
+    valid = visible & (hip_width > 0)
+    ratios = np.zeros(len(landmarks))
+    np.divide(shoulder_width, hip_width, out=ratios, where=valid)
+    return ratios
+
+def get_v_taper_scores(v_taper_ratios: np.ndarray) -> np.ndarray:
+    """
+    Converts an array of V-Taper ratios into integer scores out of 100.
+    """
+    ratios = np.asarray(v_taper_ratios, dtype=np.float64)
+    scores = 100 * (ratios - V_TAPER_BASELINE_RATIO) / (V_TAPER_IDEAL_RATIO - V_TAPER_BASELINE_RATIO)
+    scores = np.clip(scores, 0, 100)
+    return np.where(ratios == 0.0, 0, scores).astype(np.int64)
+
+def calculate_total_package_scores(v_taper_scores, muscularity_scores, conditioning_scores,
+                                   division: str = DEFAULT_DIVISION) -> np.ndarray:
+    """
+    Calculates the Total Package Score for N athletes (or frames) at once.
+
+    Args:
+        v_taper_scores: (N,) symmetry scores (or scalars, broadcast).
+        muscularity_scores: (N,) muscularity scores.
+        conditioning_scores: (N,) conditioning scores.
+        division: The competition division, which selects the category weights.
+
+    Returns:
+        An (N,) integer array of Total Package Scores.
+    """
+    if division not in DIVISION_WEIGHTS:
+        raise ValueError(f"Unknown division '{division}'. Expected one of: {', '.join(DIVISION_WEIGHTS)}")
+    scores = np.stack(np.broadcast_arrays(
+        np.atleast_1d(np.asarray(v_taper_scores, dtype=np.float64)),
+        np.atleast_1d(np.asarray(muscularity_scores, dtype=np.float64)),
+        np.atleast_1d(np.asarray(conditioning_scores, dtype=np.float64)),
+    ), axis=1)
+    weights = np.asarray(DIVISION_WEIGHTS[division])
+
     # Calculate the weighted average
-    weighted_average = np.average(scores, weights=weights)
-    
+    weighted_average = scores @ weights / weights.sum()
+
     # Calculate a penalty based on the standard deviation of the scores
     # A higher std dev means more imbalance, resulting in a larger penalty.
-    std_dev = np.std(scores)
+    std_dev = scores.std(axis=1)
     penalty_factor = 1 - (std_dev / 100) # The 100 is a scaling factor, can be tuned
-    
+
     # Apply the penalty
-    final_score = weighted_average * penalty_factor
-    
-    return int(final_score)
+    return (weighted_average * penalty_factor).astype(np.int64)
+
+@timed("static_scoring")
+def analyze_static_pose(image: np.ndarray, landmarks: "landmark_pb2.NormalizedLandmarkList",
+                        cache_key: Optional[str] = None, division: str = DEFAULT_DIVISION) -> dict:
+    """
+    Runs every static scorer on a preprocessed image.
+
+    Args:
+        image: The preprocessed (annotated) RGB image.
+        landmarks: The NormalizedLandmarkList detected on that image.
+        cache_key: Optional content key of the source upload; when given, results
+            are read from and stored in the shared result cache.
+        division: The competition division used for the Total Package Score.
+
+    Returns:
+        A dictionary with the V-Taper ratio and score, the muscularity and
+        conditioning breakdowns, and the Total Package Score.
+    """
+    if cache_key is not None:
+        # Hashed, since the key doubles as a file name in the disk tier.
+        cache_key = content_key(cache_key.encode(), division)
+        cached = get_result_cache().get("scores", cache_key)
+        if cached is not None:
+            return cached
+
+    height, width, _ = image.shape
+    v_taper_ratio = calculate_v_taper_ratio(landmarks, width, height)
+    v_taper_score = get_v_taper_score(v_taper_ratio)
+    muscularity_results = analyze_muscularity(image)
+    conditioning_results = analyze_conditioning(image)
+    total_score = calculate_total_package_score(
+        v_taper_score,
+        muscularity_results["Overall Fullness"],
+        conditioning_results["Overall Conditioning"],
+        division
+    )
+    results = {
+        "v_taper_ratio": v_taper_ratio,
+        "v_taper_score": v_taper_score,
+        "muscularity": muscularity_results,
+        "conditioning": conditioning_results,
+        "total_score": total_score,
+    }
+
+    if cache_key is not None:
+        get_result_cache().put("scores", cache_key, results)
+    return results
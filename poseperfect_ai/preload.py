@@ -0,0 +1,45 @@
+import importlib
+import threading
+from typing import Optional
+
+from .preprocessing.background_remover import get_background_remover
+from .preprocessing.pose_estimator_pool import warm_up_pose_estimators
+
+# Backends that the package imports lazily, in the order they are first needed.
+HEAVY_BACKENDS = ("cv2", "mediapipe", "rembg", "scipy.signal", "scipy.ndimage")
+
+
+def preload_backends(warm_up_models: bool = False, background: bool = True) -> Optional[threading.Thread]:
+    """
+    Imports the heavy backends ahead of first use, and optionally loads the models.
+
+    Importing this package is cheap because mediapipe, rembg, OpenCV and SciPy are
+    only imported when first used. Calling this at startup moves that cost off the
+    first request without blocking the caller.
+
+    Args:
+        warm_up_models: Also load the pose estimator and the rembg session.
+        background: Run in a daemon thread and return immediately.
+
+    Returns:
+        The preload thread, or None when run in the foreground.
+    """
+    def _preload():
+        for name in HEAVY_BACKENDS:
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                print(f"[preload] Could not import {name}: {e}")
+        if warm_up_models:
+            try:
+                warm_up_pose_estimators()
+                get_background_remover().session
+            except Exception as e:
+                print(f"[preload] Model warm-up failed: {e}")
+
+    if not background:
+        _preload()
+        return None
+    thread = threading.Thread(target=_preload, name="poseperfect-preload", daemon=True)
+    thread.start()
+    return thread
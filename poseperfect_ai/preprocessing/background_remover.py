@@ -0,0 +1,121 @@
+import contextvars
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+from PIL import Image
+
+from ..utils.lazy import lazy_import
+from ..utils.resources import cache_resource
+
+# Importing rembg pulls in onnxruntime and numba, which takes seconds.
+rembg = lazy_import("rembg")
+
+# rembg imports pymatting, whose numba kernels default to the TBB threading layer
+# when it is installed; TBB initialized off the main thread (the preload thread,
+# Streamlit's script thread) hangs interpreter shutdown. Alpha matting is never
+# used here, so the portable workqueue layer costs nothing.
+os.environ.setdefault("NUMBA_THREADING_LAYER", "workqueue")
+
+DEFAULT_MODEL_NAME = "u2net"
+
+ImageInput = Union[bytes, Image.Image, np.ndarray]
+
+
+def _to_pil(image: ImageInput) -> Image.Image:
+    """
+    Decodes encoded bytes or wraps an RGB/RGBA array as a PIL image.
+    """
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, np.ndarray):
+        return Image.fromarray(image)
+    return Image.open(io.BytesIO(image))
+
+
+class BackgroundRemover:
+    """
+    Removes image backgrounds with a single, persistent rembg model session.
+
+    The U2Net model is loaded from disk once, on first use, and then shared by every
+    call (onnxruntime sessions are safe to run from several threads). Images are
+    passed in memory, so there is no CLI subprocess or temp file per image.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, max_workers: Optional[int] = None):
+        self.model_name = model_name
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The rembg session, loaded on first access."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = rembg.new_session(self.model_name)
+        return self._session
+
+    def remove(self, image: ImageInput, only_mask: bool = False) -> Image.Image:
+        """
+        Removes the background from one image.
+
+        Args:
+            image: Encoded image bytes, a PIL image, or an RGB(A) NumPy array.
+            only_mask: Return just the foreground mask, skipping the RGBA cutout,
+                for callers that already hold the decoded image.
+
+        Returns:
+            An RGBA PIL image with a transparent background, or an "L" mask image.
+        """
+        return rembg.remove(_to_pil(image), session=self.session, only_mask=only_mask)
+
+    def remove_batch(self, images: Sequence[ImageInput], return_exceptions: bool = False,
+                     only_mask: bool = False) -> List[Union[Image.Image, Exception]]:
+        """
+        Removes the background from many in-memory images using the shared session.
+
+        Args:
+            images: A sequence of encoded bytes, PIL images, or NumPy arrays.
+            return_exceptions: If True, a failing image yields its exception in the
+                result list instead of aborting the whole batch.
+            only_mask: Return foreground masks instead of RGBA cutouts.
+
+        Returns:
+            RGBA PIL images or masks (or exceptions), in the same order as `images`.
+        """
+        # Load the model before fanning out so workers don't race to do it.
+        self.session
+
+        def _remove_one(image: ImageInput) -> Union[Image.Image, Exception]:
+            try:
+                return self.remove(image, only_mask)
+            except Exception as e:
+                if return_exceptions:
+                    return e
+                raise
+
+        if len(images) <= 1 or self.max_workers == 1:
+            return [_remove_one(image) for image in images]
+        # Each task runs in a copy of this context, so spans reach `collect_spans`.
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, _remove_one, image) for image in images]
+            return [future.result() for future in futures]
+
+
+# --- Process-wide shared remover ---
+
+@cache_resource(pinned=True)
+def get_background_remover(model_name: str = DEFAULT_MODEL_NAME) -> BackgroundRemover:
+    """
+    Returns the process-wide background remover for a model, shared by every
+    Streamlit session and rerun. The model is loaded here, so the resource
+    manager accounts for its memory.
+    """
+    remover = BackgroundRemover(model_name)
+    remover.session
+    return remover
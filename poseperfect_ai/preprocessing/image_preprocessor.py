@@ -1,63 +1,304 @@
-import numpy as np
-from PIL import Image
-from rembg import remove
+import contextvars
 import io
-import cv2
-import mediapipe as mp
-from typing import Tuple
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from ..utils.lazy import lazy_import
+from ..utils.metrics import span, timed
+from ..utils.result_cache import content_key, get_result_cache
+from .background_remover import get_background_remover
+from .lighting import normalize_lighting
+from .pose_estimator_pool import DEFAULT_MODEL_COMPLEXITY, get_pose_pool
+
+cv2 = lazy_import("cv2")
+mp = lazy_import("mediapipe")
+landmark_pb2 = lazy_import("mediapipe.framework.formats.landmark_pb2")
 
 def remove_background(image_bytes: bytes) -> Image.Image:
     """
-    Removes the background from an image.
+    Removes the background from an image using the shared rembg session.
+    """
+    return get_background_remover().remove(image_bytes)
+
+def apply_alpha_mask(image: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """
+    Blacks out the background of an RGB image in place by scaling it with an
+    alpha mask (the same result as compositing rembg's cutout onto black).
+    """
+    cv2.multiply(image, cv2.cvtColor(alpha, cv2.COLOR_GRAY2RGB), dst=image, scale=1 / 255)
+    return image
+
+@timed("pose_detection")
+def detect_landmarks(image: np.ndarray, model_complexity: int = DEFAULT_MODEL_COMPLEXITY) -> any:
+    """
+    Detects pose landmarks on an RGB image with an estimator borrowed from the
+    shared pose estimator pool, so the model is loaded once per pooled estimator
+    rather than once per image.
     """
-    output_bytes = remove(image_bytes)
-    return Image.open(io.BytesIO(output_bytes))
+    with get_pose_pool().estimator(model_complexity) as pose:
+        return pose.process(image).pose_landmarks
 
-def normalize_lighting(image: np.ndarray) -> np.ndarray:
+@timed("draw_landmarks")
+def draw_landmarks(image: np.ndarray, landmarks: any) -> np.ndarray:
     """
-    Applies CLAHE to normalize image lighting.
+    Draws pose landmarks onto an RGB image, in place, and returns it.
     """
-    lab_image = cv2.cvtColor(image, cv2.COLOR_RGB2LAB)
-    l_channel, a_channel, b_channel = cv2.split(lab_image)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    cl_channel = clahe.apply(l_channel)
-    merged_lab = cv2.merge((cl_channel, a_channel, b_channel))
-    return cv2.cvtColor(merged_lab, cv2.COLOR_LAB2RGB)
+    mp_drawing = mp.solutions.drawing_utils
+    mp_drawing.draw_landmarks(
+        image,
+        landmarks,
+        mp.solutions.pose.POSE_CONNECTIONS,
+        landmark_drawing_spec=mp_drawing.DrawingSpec(color=(245,117,66), thickness=2, circle_radius=2),
+        connection_drawing_spec=mp_drawing.DrawingSpec(color=(245,66,230), thickness=2, circle_radius=2)
+    )
+    return image
 
-def detect_and_draw_landmarks(image: np.ndarray) -> Tuple[np.ndarray, any]:
+def detect_and_draw_landmarks(image: np.ndarray, model_complexity: int = DEFAULT_MODEL_COMPLEXITY) -> Tuple[np.ndarray, any]:
     """
-    Detects pose landmarks and draws them on the image.
+    Detects pose landmarks and draws them on a copy of the image.
     """
-    mp_pose = mp.solutions.pose
-    pose = mp_pose.Pose(static_image_mode=True, model_complexity=2)
-    results = pose.process(image)
-    
+    landmarks = detect_landmarks(image, model_complexity)
     annotated_image = image.copy()
-    if results.pose_landmarks:
-        mp_drawing = mp.solutions.drawing_utils
-        mp_drawing.draw_landmarks(
-            annotated_image,
-            results.pose_landmarks,
-            mp_pose.POSE_CONNECTIONS,
-            landmark_drawing_spec=mp_drawing.DrawingSpec(color=(245,117,66), thickness=2, circle_radius=2),
-            connection_drawing_spec=mp_drawing.DrawingSpec(color=(245,66,230), thickness=2, circle_radius=2)
-        )
-    return annotated_image, results.pose_landmarks
-
-def preprocess_for_static_analysis(image_bytes: bytes) -> Tuple[np.ndarray, any]:
+    if landmarks:
+        draw_landmarks(annotated_image, landmarks)
+    return annotated_image, landmarks
+
+# --- Resolution and region of interest ---
+
+class QualitySettings(NamedTuple):
+    """How much resolution and model capacity the static pipeline spends per image."""
+    max_dimension: Optional[int]    # Longest side of the working image; None keeps the full resolution
+    model_complexity: int           # MediaPipe Pose model complexity (0-2)
+
+# The quality/speed knob. Landmarks are normalized, so scores are comparable
+# across presets; see benchmarks/preprocess_quality.py for the trade-off.
+QUALITY_PRESETS = {
+    "fast": QualitySettings(max_dimension=512, model_complexity=1),
+    "balanced": QualitySettings(max_dimension=1024, model_complexity=DEFAULT_MODEL_COMPLEXITY),
+    "full": QualitySettings(max_dimension=None, model_complexity=DEFAULT_MODEL_COMPLEXITY),
+}
+DEFAULT_QUALITY = "balanced"
+
+# Pixels with at least this alpha count as the athlete when cropping.
+ROI_ALPHA_THRESHOLD = 128
+# Margin added around the athlete's bounding box, as a fraction of its size.
+ROI_PADDING = 0.1
+
+def _quality_settings(quality: str) -> QualitySettings:
+    try:
+        return QUALITY_PRESETS[quality]
+    except KeyError:
+        raise ValueError(f"Unknown quality {quality!r}. Expected one of: {', '.join(QUALITY_PRESETS)}.") from None
+
+@timed("decode")
+def decode_image(image_bytes: bytes, max_dimension: Optional[int] = None) -> Image.Image:
+    """
+    Decodes an image so its longest side is at most `max_dimension` pixels.
+
+    JPEGs are decoded at a reduced scale (1/2, 1/4 or 1/8) by the decoder itself,
+    so a 24-megapixel photo is never expanded to full size just to be shrunk.
+    """
+    image = Image.open(io.BytesIO(image_bytes))
+    if max_dimension and max(image.size) > max_dimension:
+        scale = max_dimension / max(image.size)
+        # draft() picks the smallest DCT scale that still covers the requested size.
+        image.draft("RGB", (int(image.width * scale), int(image.height * scale)))
+    # Apply the EXIF orientation here, as rembg would, so masks line up with the image.
+    ImageOps.exif_transpose(image, in_place=True)
+    if max_dimension:
+        image.thumbnail((max_dimension, max_dimension), Image.BILINEAR)
+    return image
+
+def athlete_bounding_box(alpha: np.ndarray, padding: float = ROI_PADDING) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Finds the athlete in a background-removal alpha mask.
+
+    Returns:
+        The padded (x0, y0, x1, y1) box, clipped to the image, or None if the mask is empty.
+    """
+    mask = alpha >= ROI_ALPHA_THRESHOLD
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
+        return None
+    y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+    pad_y, pad_x = int((y1 - y0) * padding), int((x1 - x0) * padding)
+    height, width = alpha.shape
+    return max(x0 - pad_x, 0), max(y0 - pad_y, 0), min(x1 + pad_x, width), min(y1 + pad_y, height)
+
+def _map_landmarks_to_frame(landmarks: any, box: Tuple[int, int, int, int], frame_width: int, frame_height: int) -> None:
+    """
+    Converts landmarks normalized to a crop into landmarks normalized to the whole
+    frame (and therefore to the original upload, which differs only in scale), in place.
+    """
+    x0, y0, x1, y1 = box
+    crop_width, crop_height = x1 - x0, y1 - y0
+    for landmark in landmarks.landmark:
+        landmark.x = (x0 + landmark.x * crop_width) / frame_width
+        landmark.y = (y0 + landmark.y * crop_height) / frame_height
+        # MediaPipe's z uses roughly the same scale as x.
+        landmark.z = landmark.z * crop_width / frame_width
+
+# --- Static pipeline ---
+
+def _get_cached_preprocessing(cache_key: str, annotate: bool) -> Optional[Tuple[np.ndarray, any]]:
+    cached = get_result_cache().get("preprocess", cache_key)
+    if cached is None:
+        return None
+    image, landmarks = cached["image"], cached["landmarks"]
+    if landmarks is not None:
+        landmarks = landmark_pb2.NormalizedLandmarkList.FromString(landmarks)
+        if annotate:
+            # Cached images are read-only; draw on a copy.
+            image = draw_landmarks(image.copy(), landmarks)
+    return image, landmarks
+
+def _preprocess_with_mask(image_pil: Image.Image, mask_pil: Image.Image, cache_key: str, use_cache: bool,
+                          annotate: bool, settings: QualitySettings) -> Tuple[np.ndarray, any]:
+    """
+    Steps 2-4 of the pipeline, given the decoded working image and its foreground mask.
+
+    Only the athlete's crop is copied out of the decoder's buffer; masking, CLAHE
+    and pose detection all work in that one array, which is then placed into the
+    (otherwise black) working frame.
+    """
+    alpha = np.asarray(mask_pil)
+    frame_height, frame_width = alpha.shape
+
+    # Step 2: Crop to the athlete, so the pose model sees them at the largest scale
+    box = athlete_bounding_box(alpha) or (0, 0, frame_width, frame_height)
+    x0, y0, x1, y1 = box
+    with span("crop_and_mask"):
+        roi_pil = image_pil.crop(box)
+        if roi_pil.mode != 'RGB':
+            roi_pil = roi_pil.convert('RGB')
+        roi = np.array(roi_pil)
+        apply_alpha_mask(roi, alpha[y0:y1, x0:x1])
+
+    # Step 3: Lighting Normalization, in place on the athlete only
+    normalize_lighting(roi, out=roi)
+
+    # Step 4: Landmark Detection, mapped back to whole-frame coordinates
+    landmarks = detect_landmarks(roi, settings.model_complexity)
+    image_np = np.zeros((frame_height, frame_width, 3), dtype=np.uint8)
+    image_np[y0:y1, x0:x1] = roi
+    if landmarks:
+        _map_landmarks_to_frame(landmarks, box, frame_width, frame_height)
+
+    if use_cache:
+        get_result_cache().put("preprocess", cache_key, {
+            "image": image_np,
+            "landmarks": landmarks.SerializeToString() if landmarks else None,
+        })
+    if annotate and landmarks:
+        # The cache stores its own copy, so drawing here leaves it clean.
+        image_np = draw_landmarks(image_np, landmarks)
+    return image_np, landmarks
+
+def preprocess_for_static_analysis(image_bytes: bytes, use_cache: bool = True, quality: str = DEFAULT_QUALITY,
+                                   annotate: bool = True) -> Tuple[np.ndarray, any]:
     """
     The main preprocessing pipeline for the Streamlit app's static analysis.
+
+    The upload is decoded at a bounded working resolution, rembg computes the
+    foreground mask, and masking, CLAHE and pose detection run on a crop around
+    the athlete. Landmarks are normalized to the whole frame, so they apply to the
+    original upload as well as to the returned (working resolution) image.
+
+    Results are cached by image content and quality, so resubmitting the same
+    photo skips background removal, CLAHE and pose detection entirely.
+
+    Args:
+        image_bytes: The encoded upload.
+        use_cache: Read and fill the shared result cache.
+        quality: A key of QUALITY_PRESETS, trading accuracy for speed.
+        annotate: Draw the landmarks on the returned image. Callers that only
+            need the scores should pass False.
+
+    Returns:
+        The working image (annotated if asked) and the landmarks (None if no pose was found).
+    """
+    settings = _quality_settings(quality)
+    cache_key = content_key(image_bytes, *settings)
+    if use_cache:
+        cached = _get_cached_preprocessing(cache_key, annotate)
+        if cached is not None:
+            return cached
+
+    # Step 1: Background Removal, at the working resolution
+    image_pil = decode_image(image_bytes, settings.max_dimension)
+    with span("background_removal"):
+        mask_pil = get_background_remover().remove(image_pil, only_mask=True)
+    return _preprocess_with_mask(image_pil, mask_pil, cache_key, use_cache, annotate, settings)
+
+def preprocess_batch_for_static_analysis(images: Sequence[bytes], use_cache: bool = True,
+                                         return_exceptions: bool = False, quality: str = DEFAULT_QUALITY,
+                                         annotate: bool = True) -> List[Union[Tuple[np.ndarray, any], Exception]]:
+    """
+    Runs the static preprocessing pipeline on several images at once.
+
+    Cache hits are answered directly; the misses go through one background-removal
+    batch on the shared rembg session, then pose detection runs concurrently on
+    the pooled estimators.
+
+    Args:
+        images: Encoded image bytes.
+        use_cache: Read and fill the shared result cache.
+        return_exceptions: If True, a failing image yields its exception in the
+            result list instead of aborting the whole batch.
+        quality: A key of QUALITY_PRESETS, trading accuracy for speed.
+        annotate: Draw the landmarks on the returned images.
+
+    Returns:
+        (image, landmarks) tuples (or exceptions), in the same order as `images`.
     """
-    # Step 1: Background Removal
-    no_bg_image_pil = remove_background(image_bytes)
-    if no_bg_image_pil.mode == 'RGBA':
-        no_bg_image_pil = no_bg_image_pil.convert('RGB')
-    image_np = np.array(no_bg_image_pil)
+    settings = _quality_settings(quality)
+    results: List[Union[Tuple[np.ndarray, any], Exception, None]] = [None] * len(images)
+    cache_keys = [content_key(image_bytes, *settings) for image_bytes in images]
+    misses = []
+    for i, cache_key in enumerate(cache_keys):
+        cached = _get_cached_preprocessing(cache_key, annotate) if use_cache else None
+        if cached is not None:
+            results[i] = cached
+        else:
+            misses.append(i)
+    if not misses:
+        return results
 
-    # Step 2: Lighting Normalization
-    normalized_image = normalize_lighting(image_np)
+    # Step 1: Decoding and Background Removal, as one batch
+    decoded = []
+    for i in misses:
+        try:
+            decoded.append(decode_image(images[i], settings.max_dimension))
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            decoded.append(e)
+    to_remove = [image for image in decoded if not isinstance(image, Exception)]
+    with span("background_removal"):
+        removed = iter(get_background_remover().remove_batch(to_remove, return_exceptions=return_exceptions,
+                                                             only_mask=True))
+    masks = [image if isinstance(image, Exception) else next(removed) for image in decoded]
 
-    # Step 3: Landmark Detection
-    annotated_image, landmarks = detect_and_draw_landmarks(normalized_image)
+    # Steps 2-4, on as many threads as there are pooled estimators
+    def _finish(i: int, image_pil: Union[Image.Image, Exception],
+                mask_pil: Union[Image.Image, Exception]) -> Union[Tuple[np.ndarray, any], Exception]:
+        if isinstance(mask_pil, Exception):
+            return mask_pil
+        try:
+            return _preprocess_with_mask(image_pil, mask_pil, cache_keys[i], use_cache, annotate, settings)
+        except Exception as e:
+            if return_exceptions:
+                return e
+            raise
 
-    return annotated_image, landmarks
\ No newline at end of file
+    # Worker threads don't inherit context variables; each task runs in a copy of
+    # this one so its spans reach an active `collect_spans` block.
+    with ThreadPoolExecutor(max_workers=min(len(misses), get_pose_pool().size)) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, _finish, i, image_pil, mask_pil)
+                   for i, image_pil, mask_pil in zip(misses, decoded, masks)]
+        for i, future in zip(misses, futures):
+            results[i] = future.result()
+    return results
@@ -0,0 +1,297 @@
+import threading
+from typing import Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from ..utils.lazy import lazy_import
+from ..utils.metrics import timed
+from .video_decoder import VideoFrame
+
+cv2 = lazy_import("cv2")
+
+CLAHE_CLIP_LIMIT = 2.0
+CLAHE_TILE_GRID_SIZE = (8, 8)
+
+# Stills up to this size go through cv2's CLAHE in one call: it is about twice as
+# fast as the banded path, matches OpenCV's edge handling exactly, and only costs
+# one extra byte per pixel for the lightness channel.
+DEFAULT_MAX_UNBANDED_PIXELS = 48 << 20
+
+# Larger stills are normalized in horizontal bands of at most this many pixels,
+# so the extra memory stays bounded however large the photo is.
+DEFAULT_MAX_TILE_PIXELS = 1 << 20
+
+# A new video shot starts when the coarse lightness of a frame differs from the
+# shot's first frame by more than this many levels (0-255), on average.
+DEFAULT_SHOT_CHANGE_THRESHOLD = 12.0
+
+GridSize = Tuple[int, int]
+
+# cv2.CLAHE objects keep internal buffers and are not safe to share across threads.
+_thread_local = threading.local()
+
+
+def get_clahe(clip_limit: float = CLAHE_CLIP_LIMIT,
+              tile_grid_size: GridSize = CLAHE_TILE_GRID_SIZE) -> "cv2.CLAHE":
+    """
+    Returns this thread's CLAHE object for the given settings, creating it once.
+    """
+    cache = getattr(_thread_local, "clahe", None)
+    if cache is None:
+        cache = _thread_local.clahe = {}
+    key = (clip_limit, tuple(tile_grid_size))
+    if key not in cache:
+        cache[key] = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tuple(tile_grid_size))
+    return cache[key]
+
+
+# --- CLAHE from lightness statistics ---
+#
+# The same algorithm as cv2.CLAHE, split in two: the per-tile lookup tables (the
+# "lighting statistics") are built from histograms, then applied to any rows with
+# bilinear interpolation between neighbouring tiles. Both halves work band by
+# band, and the tables can be reused across the frames of a video shot.
+
+def _tile_edges(length: int, tiles: int) -> Tuple[int, np.ndarray]:
+    """The tile size (as cv2 pads it) and the tile boundaries along one axis."""
+    tile_size = -(-length // tiles)
+    return tile_size, np.minimum(np.arange(tiles + 1) * tile_size, length)
+
+
+def _accumulate_histograms(l_rows: np.ndarray, row_offset: int, histograms: np.ndarray,
+                           row_edges: np.ndarray, col_edges: np.ndarray) -> None:
+    """Adds the lightness histograms of a band of rows to the per-tile histograms."""
+    row_end = row_offset + l_rows.shape[0]
+    for ty in range(histograms.shape[0]):
+        y0, y1 = max(row_edges[ty], row_offset), min(row_edges[ty + 1], row_end)
+        if y0 >= y1:
+            continue
+        for tx in range(histograms.shape[1]):
+            tile = l_rows[y0 - row_offset:y1 - row_offset, col_edges[tx]:col_edges[tx + 1]]
+            histograms[ty, tx] += np.bincount(tile.ravel(), minlength=256)
+
+
+def _histograms_to_luts(histograms: np.ndarray, clip_limit: float) -> np.ndarray:
+    """
+    Clips and redistributes each tile histogram as cv2.CLAHE does, and returns the
+    (tiles_y, tiles_x, 256) float32 equalization tables.
+    """
+    areas = np.maximum(histograms.sum(axis=-1, keepdims=True), 1)
+    limits = np.maximum((clip_limit * areas / 256).astype(np.int64), 1)
+    excess = np.maximum(histograms - limits, 0).sum(axis=-1, keepdims=True)
+    histograms = np.minimum(histograms, limits) + excess // 256
+    # The remainder goes one count at a time to evenly spaced bins.
+    residual = excess % 256
+    step = np.maximum(256 // np.maximum(residual, 1), 1)
+    bins = np.arange(256)
+    histograms += (bins % step == 0) & (bins // step < residual)
+    luts = np.cumsum(histograms, axis=-1) * (255.0 / areas)
+    return np.clip(np.rint(luts), 0, 255).astype(np.float32)
+
+
+def _interpolation_axis(coords: np.ndarray, tile_size: int, tiles: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The two neighbouring tile indices and the blend weight for each coordinate."""
+    position = coords / tile_size - 0.5
+    first = np.floor(position)
+    weight = (position - first).astype(np.float32)
+    first = first.astype(np.intp)
+    return np.clip(first, 0, tiles - 1), np.clip(first + 1, 0, tiles - 1), weight
+
+
+class _ColumnTables:
+    """
+    Each tile row's tables blended across the columns of an image, built on
+    demand, so equalizing takes two table lookups per pixel instead of four.
+
+    Rows are equalized top to bottom, so only the last `max_rows` tile rows are
+    kept (None keeps them all, for reuse across video frames).
+    """
+
+    def __init__(self, luts: np.ndarray, tile_width: int, width: int, max_rows: Optional[int] = None):
+        self.luts = luts
+        self.tx0, self.tx1, wx = _interpolation_axis(np.arange(width), tile_width, luts.shape[1])
+        self.wx = wx[:, None]
+        self.max_rows = max_rows
+        self._rows = {}
+
+    def __getitem__(self, tile_row: int) -> np.ndarray:
+        """The (width * 256,) float32 table of one tile row."""
+        if tile_row not in self._rows:
+            if self.max_rows is not None and len(self._rows) >= self.max_rows:
+                del self._rows[min(self._rows)]
+            luts = self.luts[tile_row]
+            self._rows[tile_row] = (luts[self.tx0] * (1 - self.wx) + luts[self.tx1] * self.wx).ravel()
+        return self._rows[tile_row]
+
+
+def _apply_column_tables(l_rows: np.ndarray, row_offset: int, tables: _ColumnTables, tile_height: int) -> None:
+    """Equalizes a band of lightness rows in place, interpolating between tile rows."""
+    height, width = l_rows.shape
+    ty0, ty1, wy = _interpolation_axis(np.arange(row_offset, row_offset + height), tile_height,
+                                       tables.luts.shape[0])
+    indices = np.arange(width, dtype=np.intp) * 256 + l_rows
+    # Rows between the same two tile centers blend the same two tables.
+    pairs = ty0 * tables.luts.shape[0] + ty1
+    starts = np.flatnonzero(np.diff(pairs, prepend=-1))
+    for y0, y1 in zip(starts, np.append(starts[1:], height)):
+        top = tables[ty0[y0]].take(indices[y0:y1])
+        bottom = tables[ty1[y0]].take(indices[y0:y1])
+        bottom -= top
+        bottom *= wy[y0:y1, None]
+        top += bottom
+        l_rows[y0:y1] = np.rint(top)
+
+
+def _band_rows(width: int, max_tile_pixels: int) -> int:
+    return max(1, max_tile_pixels // max(width, 1))
+
+
+# --- Normalization stage ---
+
+class LightingNormalizer:
+    """
+    Normalizes image lighting with CLAHE on the lightness (L) channel of LAB.
+
+    Images up to `max_unbanded_pixels` use this thread's reusable cv2.CLAHE
+    object. Larger ones are converted, measured and equalized in bands of at most
+    `max_tile_pixels`, so only a band's worth of temporary memory is ever needed.
+    Edge tiles are padded differently from OpenCV there, so the banded output can
+    differ from cv2's by a few levels.
+    """
+
+    def __init__(self, clip_limit: float = CLAHE_CLIP_LIMIT, tile_grid_size: GridSize = CLAHE_TILE_GRID_SIZE,
+                 max_tile_pixels: int = DEFAULT_MAX_TILE_PIXELS,
+                 max_unbanded_pixels: int = DEFAULT_MAX_UNBANDED_PIXELS):
+        self.clip_limit = clip_limit
+        self.tile_grid_size = tuple(tile_grid_size)
+        self.max_tile_pixels = max_tile_pixels
+        self.max_unbanded_pixels = max_unbanded_pixels
+
+    @timed("lighting")
+    def normalize(self, image: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Normalizes an RGB image, writing into `out` (or a new array if not given);
+        pass `out=image` to normalize in place.
+        """
+        height, width = image.shape[:2]
+        if height * width <= self.max_unbanded_pixels:
+            lab_image = cv2.cvtColor(image, cv2.COLOR_RGB2LAB, dst=out)
+            l_channel = cv2.extractChannel(lab_image, 0)
+            get_clahe(self.clip_limit, self.tile_grid_size).apply(l_channel, l_channel)
+            cv2.insertChannel(l_channel, lab_image, 0)
+            return cv2.cvtColor(lab_image, cv2.COLOR_LAB2RGB, dst=lab_image)
+
+        if out is None:
+            out = np.empty_like(image)
+        band = _band_rows(width, self.max_tile_pixels)
+        tile_height, tile_width, row_edges, col_edges = self._tile_layout(height, width)
+        # Pass 1: convert to LAB and gather the tile histograms
+        histograms = np.zeros((len(row_edges) - 1, len(col_edges) - 1, 256), dtype=np.int64)
+        for y in range(0, height, band):
+            cv2.cvtColor(image[y:y + band], cv2.COLOR_RGB2LAB, dst=out[y:y + band])
+            _accumulate_histograms(out[y:y + band, :, 0], y, histograms, row_edges, col_edges)
+        tables = _ColumnTables(_histograms_to_luts(histograms, self.clip_limit), tile_width, width, max_rows=2)
+        # Pass 2: equalize L and convert back
+        for y in range(0, height, band):
+            l_rows = cv2.extractChannel(out[y:y + band], 0)
+            _apply_column_tables(l_rows, y, tables, tile_height)
+            cv2.insertChannel(l_rows, out[y:y + band], 0)
+            cv2.cvtColor(out[y:y + band], cv2.COLOR_LAB2RGB, dst=out[y:y + band])
+        return out
+
+    def lightness_statistics(self, l_channel: np.ndarray) -> np.ndarray:
+        """Builds the (tiles_y, tiles_x, 256) CLAHE tables for a lightness channel."""
+        height, width = l_channel.shape
+        _, _, row_edges, col_edges = self._tile_layout(height, width)
+        histograms = np.zeros((len(row_edges) - 1, len(col_edges) - 1, 256), dtype=np.int64)
+        band = _band_rows(width, self.max_tile_pixels)
+        for y in range(0, height, band):
+            _accumulate_histograms(l_channel[y:y + band], y, histograms, row_edges, col_edges)
+        return _histograms_to_luts(histograms, self.clip_limit)
+
+    def _tile_layout(self, height: int, width: int) -> Tuple[int, int, np.ndarray, np.ndarray]:
+        """The tile height and width, and the tile boundaries down and across the image."""
+        # cv2's tileGridSize is (columns, rows).
+        tiles_x, tiles_y = self.tile_grid_size
+        tile_height, row_edges = _tile_edges(height, tiles_y)
+        tile_width, col_edges = _tile_edges(width, tiles_x)
+        return tile_height, tile_width, row_edges, col_edges
+
+    def for_video(self, shot_change_threshold: float = DEFAULT_SHOT_CHANGE_THRESHOLD) -> "ShotLightingNormalizer":
+        """A video normalizer with these CLAHE settings."""
+        return ShotLightingNormalizer(self, shot_change_threshold)
+
+
+class ShotLightingNormalizer:
+    """
+    Normalizes the frames of one video with lighting statistics computed once per shot.
+
+    The first frame of a shot builds the CLAHE tables (pre-blended across the
+    frame's columns); later frames only look them up, which skips the histograms
+    and keeps the normalization from flickering as the athlete moves. A new shot
+    (a cut, or the stage lights changing) is detected from the coarse lightness
+    layout and rebuilds the tables.
+    Not thread-safe: use one per video stream.
+    """
+
+    def __init__(self, normalizer: Optional[LightingNormalizer] = None,
+                 shot_change_threshold: float = DEFAULT_SHOT_CHANGE_THRESHOLD):
+        self.normalizer = normalizer or LightingNormalizer()
+        self.shot_change_threshold = shot_change_threshold
+        self.shot_count = 0
+        self._tables: Optional[_ColumnTables] = None
+        self._tile_height = 0
+        self._frame_shape: Optional[Tuple[int, int]] = None
+        self._reference: Optional[np.ndarray] = None
+
+    def reset(self) -> None:
+        """Forgets the current shot, so the next frame starts a new one."""
+        self._tables = self._frame_shape = self._reference = None
+
+    def _is_new_shot(self, frame_shape: Tuple[int, int], layout: np.ndarray) -> bool:
+        if self._reference is None or self._frame_shape != frame_shape:
+            return True
+        return float(np.mean(np.abs(layout - self._reference))) > self.shot_change_threshold
+
+    @timed("video_lighting")
+    def normalize(self, frame: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Normalizes one RGB frame, writing into `out` (or a new array if not given).
+        """
+        lab_frame = cv2.cvtColor(frame, cv2.COLOR_RGB2LAB, dst=out)
+        l_channel = cv2.extractChannel(lab_frame, 0)
+        # The mean lightness of each CLAHE tile, as a cheap fingerprint of the lighting.
+        layout = cv2.resize(l_channel, self.normalizer.tile_grid_size, interpolation=cv2.INTER_AREA).astype(np.float32)
+        if self._is_new_shot(l_channel.shape, layout):
+            height, width = l_channel.shape
+            self._tile_height, tile_width, _, _ = self.normalizer._tile_layout(height, width)
+            luts = self.normalizer.lightness_statistics(l_channel)
+            self._tables = _ColumnTables(luts, tile_width, width)
+            self._frame_shape = l_channel.shape
+            self._reference = layout
+            self.shot_count += 1
+        _apply_column_tables(l_channel, 0, self._tables, self._tile_height)
+        cv2.insertChannel(l_channel, lab_frame, 0)
+        return cv2.cvtColor(lab_frame, cv2.COLOR_LAB2RGB, dst=lab_frame)
+
+
+def normalize_video_frames(frames: Iterable[VideoFrame],
+                           normalizer: Optional[ShotLightingNormalizer] = None) -> Iterator[VideoFrame]:
+    """
+    Normalizes the lighting of a frame stream in place, shot by shot.
+    """
+    normalizer = normalizer or ShotLightingNormalizer()
+    for frame in frames:
+        normalizer.normalize(frame.image, out=frame.image)
+        yield frame
+
+
+_default_normalizer = LightingNormalizer()
+
+
+def normalize_lighting(image: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Applies CLAHE to the lightness channel to normalize image lighting, with the
+    default settings; pass `out=image` to normalize in place.
+    """
+    return _default_normalizer.normalize(image, out)
@@ -0,0 +1,189 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from ..utils.lazy import lazy_import
+from ..utils.resources import current_rss, cache_resource
+
+mp = lazy_import("mediapipe")
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MODEL_COMPLEXITY = 2
+
+# Pools are keyed by (model_complexity, static_image_mode) so the static image
+# path and a tracking-mode video path can share one pool without mixing graphs.
+PoolKey = Tuple[int, bool]
+
+
+class PoseEstimatorPool:
+    """
+    A thread-safe pool of reusable MediaPipe Pose estimators.
+
+    Building a Pose graph and loading its model is far more expensive than running
+    it, so estimators are created lazily (at most `size` per key), checked out for
+    the duration of one inference, and returned for the next caller. The RSS
+    growth of each creation is added to `memory_bytes` (approximate when other
+    threads allocate at the same time).
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE):
+        if size < 1:
+            raise ValueError(f"Pool size must be at least 1, got {size}.")
+        self.size = size
+        self._cond = threading.Condition()
+        self._idle: Dict[PoolKey, List["mp.solutions.pose.Pose"]] = {}
+        self._created: Dict[PoolKey, int] = {}
+        self._closed = False
+        self.memory_bytes = 0
+
+    def acquire(self, model_complexity: int = DEFAULT_MODEL_COMPLEXITY,
+                static_image_mode: bool = True,
+                timeout: Optional[float] = None) -> "mp.solutions.pose.Pose":
+        """
+        Checks out an estimator, creating one if the pool for this key is not full.
+
+        Args:
+            model_complexity: The MediaPipe Pose model complexity (0, 1 or 2).
+            static_image_mode: False for a tracking-mode estimator (video).
+            timeout: Seconds to wait for a free estimator, or None to wait forever.
+
+        Returns:
+            A Pose estimator that must be handed back with `release`.
+        """
+        key = (model_complexity, static_image_mode)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("The pose estimator pool has been shut down.")
+                idle = self._idle.setdefault(key, [])
+                if idle:
+                    return idle.pop()
+                if self._created.get(key, 0) < self.size:
+                    # Reserve the slot now and build the graph outside the lock.
+                    self._created[key] = self._created.get(key, 0) + 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError(f"No pose estimator became available within {timeout}s.")
+                self._cond.wait(remaining)
+
+        try:
+            pose_class = mp.solutions.pose.Pose  # Import mediapipe before measuring
+            rss_before = current_rss()
+            estimator = pose_class(static_image_mode=static_image_mode, model_complexity=model_complexity)
+            with self._cond:
+                self.memory_bytes += max(current_rss() - rss_before, 0)
+            return estimator
+        except Exception:
+            with self._cond:
+                self._created[key] -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, estimator: "mp.solutions.pose.Pose",
+                model_complexity: int = DEFAULT_MODEL_COMPLEXITY,
+                static_image_mode: bool = True) -> None:
+        """
+        Returns a checked-out estimator to the pool.
+        """
+        key = (model_complexity, static_image_mode)
+        if not static_image_mode:
+            # Tracking state belongs to the previous stream, not the next one.
+            estimator.reset()
+        with self._cond:
+            if self._closed:
+                self._created[key] = self._created.get(key, 1) - 1
+                estimator.close()
+                return
+            self._idle.setdefault(key, []).append(estimator)
+            self._cond.notify()
+
+    @contextmanager
+    def estimator(self, model_complexity: int = DEFAULT_MODEL_COMPLEXITY,
+                  static_image_mode: bool = True,
+                  timeout: Optional[float] = None) -> Iterator["mp.solutions.pose.Pose"]:
+        """
+        Context manager that checks out an estimator and always returns it.
+        """
+        pose = self.acquire(model_complexity, static_image_mode, timeout)
+        try:
+            yield pose
+        finally:
+            self.release(pose, model_complexity, static_image_mode)
+
+    def warm_up(self, model_complexity: int = DEFAULT_MODEL_COMPLEXITY,
+                static_image_mode: bool = True, count: int = 1) -> None:
+        """
+        Creates up to `count` estimators and runs a blank frame through each, so
+        graph construction and model loading happen before the first real request.
+        """
+        count = min(count, self.size)
+        estimators = [self.acquire(model_complexity, static_image_mode) for _ in range(count)]
+        try:
+            blank = np.zeros((64, 64, 3), dtype=np.uint8)
+            for pose in estimators:
+                pose.process(blank)
+        finally:
+            for pose in estimators:
+                self.release(pose, model_complexity, static_image_mode)
+
+    def shutdown(self) -> None:
+        """
+        Closes all idle estimators. Checked-out estimators are closed when released.
+        """
+        with self._cond:
+            self._closed = True
+            for key, idle in self._idle.items():
+                for pose in idle:
+                    pose.close()
+                self._created[key] -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+
+
+# --- Process-wide shared pool ---
+
+_shared_pool_size = DEFAULT_POOL_SIZE
+
+
+# Estimators are created after the pool is returned, so the pool reports its own size.
+@cache_resource(pinned=True, closer=PoseEstimatorPool.shutdown, size_bytes=lambda pool: pool.memory_bytes)
+def _create_shared_pool(size: int) -> PoseEstimatorPool:
+    return PoseEstimatorPool(size)
+
+
+def configure_pose_pool(size: int) -> None:
+    """
+    Sets the size of the shared pool. Replaces (and shuts down) any existing pool.
+    """
+    global _shared_pool_size
+    if size < 1:
+        raise ValueError(f"Pool size must be at least 1, got {size}.")
+    _shared_pool_size = size
+    _create_shared_pool.clear()
+
+
+def get_pose_pool() -> PoseEstimatorPool:
+    """
+    Returns the process-wide pose estimator pool, creating it on first use. The
+    pool is owned by the shared resource manager, so it survives Streamlit reruns.
+    """
+    return _create_shared_pool(_shared_pool_size)
+
+
+def shutdown_pose_pool() -> None:
+    """
+    Shuts down the shared pool. A fresh pool is created on the next use.
+    """
+    _create_shared_pool.clear()
+
+
+def warm_up_pose_estimators(model_complexity: int = DEFAULT_MODEL_COMPLEXITY, count: int = 1) -> None:
+    """
+    Warm-up hook for startup: pre-loads static-mode estimators in the shared pool.
+    """
+    get_pose_pool().warm_up(model_complexity, static_image_mode=True, count=count)
@@ -0,0 +1,196 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import BinaryIO, Iterable, Iterator, NamedTuple, Optional, Union
+
+import numpy as np
+
+from ..utils.lazy import lazy_import
+from ..utils.metrics import span
+
+cv2 = lazy_import("cv2")
+
+# A video can be given as a file path, raw bytes, or a binary file-like object
+# (e.g. a Streamlit UploadedFile).
+VideoSource = Union[str, bytes, BinaryIO]
+
+_COPY_CHUNK_SIZE = 1 << 20
+
+
+class VideoFrame(NamedTuple):
+    """A single decoded frame."""
+    index: int          # Frame index in the source video
+    timestamp: float    # Seconds from the start of the video
+    image: np.ndarray   # RGB uint8 image, possibly downscaled
+
+
+class VideoInfo(NamedTuple):
+    """Basic properties of a video stream."""
+    fps: float
+    frame_count: int
+    width: int
+    height: int
+
+    @property
+    def duration(self) -> float:
+        return self.frame_count / self.fps if self.fps > 0 else 0.0
+
+
+@contextmanager
+def open_video_path(source: VideoSource) -> Iterator[str]:
+    """
+    Yields a file path OpenCV can open. OpenCV cannot decode from memory, so bytes
+    and buffers are spooled to a temporary file in chunks (which is removed after).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        yield os.fspath(source)
+        return
+
+    temp_file = tempfile.NamedTemporaryFile(suffix=".video", delete=False)
+    try:
+        with temp_file:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                temp_file.write(source)
+            else:
+                if hasattr(source, "seek"):
+                    source.seek(0)
+                shutil.copyfileobj(source, temp_file, _COPY_CHUNK_SIZE)
+        yield temp_file.name
+    finally:
+        os.remove(temp_file.name)
+
+
+def _open_capture(path: str) -> "cv2.VideoCapture":
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        capture.release()
+        raise ValueError(f"Could not open video: {path}")
+    return capture
+
+
+def get_video_info(source: VideoSource) -> VideoInfo:
+    """
+    Reads the frame rate, frame count and resolution of a video without decoding it.
+    """
+    with open_video_path(source) as path:
+        capture = _open_capture(path)
+        try:
+            return VideoInfo(
+                fps=capture.get(cv2.CAP_PROP_FPS) or 0.0,
+                frame_count=int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+                width=int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                height=int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            )
+        finally:
+            capture.release()
+
+
+def _frame_step(source_fps: float, stride: int, target_fps: Optional[float]) -> int:
+    """Number of source frames to advance per yielded frame."""
+    if target_fps and source_fps > 0 and target_fps < source_fps:
+        stride = max(stride, int(round(source_fps / target_fps)))
+    return max(stride, 1)
+
+
+def _downscale(image: np.ndarray, max_dimension: Optional[int]) -> np.ndarray:
+    """Shrinks an image so its longest side is at most `max_dimension` pixels."""
+    if not max_dimension:
+        return image
+    height, width = image.shape[:2]
+    scale = max_dimension / max(height, width)
+    if scale >= 1.0:
+        return image
+    new_size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(image, new_size, interpolation=cv2.INTER_AREA)
+
+
+def iter_video_frames(source: VideoSource, stride: int = 1, target_fps: Optional[float] = None,
+                      max_dimension: Optional[int] = None) -> Iterator[VideoFrame]:
+    """
+    Streams decoded frames from a video, one at a time.
+
+    Only the current frame is held in memory, so memory use does not grow with the
+    length of the routine. Skipped frames are only grabbed (not converted), and
+    frames are downscaled before the BGR->RGB conversion.
+
+    Args:
+        source: A file path, raw bytes, or a binary file-like object.
+        stride: Yield every `stride`-th frame.
+        target_fps: If set, subsample to roughly this many frames per second
+            (combined with `stride` by taking the larger step).
+        max_dimension: If set, downscale frames so the longest side fits.
+
+    Yields:
+        VideoFrame tuples of (index, timestamp in seconds, RGB image).
+    """
+    with open_video_path(source) as path:
+        capture = _open_capture(path)
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+            step = _frame_step(fps, stride, target_fps)
+            index = 0
+            while True:
+                if not capture.grab():
+                    break
+                if index % step == 0:
+                    with span("video_decode"):
+                        ok, frame_bgr = capture.retrieve()
+                        if not ok:
+                            break
+                        frame_bgr = _downscale(frame_bgr, max_dimension)
+                        timestamp = index / fps if fps > 0 else capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                        frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+                    yield VideoFrame(index, timestamp, frame_rgb)
+                index += 1
+        finally:
+            capture.release()
+
+
+def read_video_frames(source: VideoSource, frame_indices: Iterable[int],
+                      max_dimension: Optional[int] = None) -> Iterator[VideoFrame]:
+    """
+    Decodes only the given frames of a video, in ascending index order.
+
+    The capture seeks to the first requested frame and then grabs forward, so
+    frames in between are skipped without being converted. Used to pull a few
+    full-resolution keyframes back out of a routine.
+
+    Args:
+        source: A file path, raw bytes, or a binary file-like object.
+        frame_indices: Indices of the frames to decode (duplicates are ignored).
+        max_dimension: If set, downscale frames so the longest side fits.
+
+    Yields:
+        VideoFrame tuples of (index, timestamp in seconds, RGB image).
+    """
+    wanted = sorted(set(int(i) for i in frame_indices))
+    if not wanted:
+        return
+    with open_video_path(source) as path:
+        capture = _open_capture(path)
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+            if wanted[0] > 0:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, wanted[0])
+            index = int(capture.get(cv2.CAP_PROP_POS_FRAMES))
+            for target in wanted:
+                while index < target and capture.grab():
+                    index += 1
+                if index < target:
+                    break  # The video ended early
+                if index > target:
+                    continue  # The seek overshot this frame
+                if not capture.grab():
+                    break
+                with span("video_decode"):
+                    ok, frame_bgr = capture.retrieve()
+                    if not ok:
+                        break
+                    frame_bgr = _downscale(frame_bgr, max_dimension)
+                    timestamp = index / fps if fps > 0 else capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+                    frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+                yield VideoFrame(index, timestamp, frame_rgb)
+                index += 1
+        finally:
+            capture.release()
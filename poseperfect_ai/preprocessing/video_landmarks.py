@@ -0,0 +1,113 @@
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from ..utils.metrics import increment, span
+from .lighting import normalize_video_frames
+from .pose_estimator_pool import get_pose_pool
+from .video_decoder import VideoFrame, VideoSource, iter_video_frames
+
+NUM_LANDMARKS = 33
+# Per-landmark channels in the landmark arrays: x, y, z, visibility.
+LANDMARK_CHANNELS = 4
+
+# Tracking mode only runs full detection when it loses the athlete, so the
+# lighter model is accurate enough for video and much faster per frame.
+DEFAULT_VIDEO_MODEL_COMPLEXITY = 1
+DEFAULT_VIDEO_MAX_DIMENSION = 640
+
+
+class LandmarkSeries(NamedTuple):
+    """
+    Pose landmarks for a whole video as compact NumPy arrays.
+
+    Frames where no pose was detected have all-zero landmarks, so their
+    visibility (channel 3) is 0 and they drop out of visibility-weighted metrics.
+    """
+    landmarks: np.ndarray      # (frames, 33, 4) float32: x, y, z, visibility
+    timestamps: np.ndarray     # (frames,) float64 seconds
+    frame_indices: np.ndarray  # (frames,) int64 index of each frame in the source video
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def fps(self) -> float:
+        """Effective sampling rate of the series (after any subsampling)."""
+        if len(self.timestamps) < 2:
+            return 0.0
+        return (len(self.timestamps) - 1) / (self.timestamps[-1] - self.timestamps[0])
+
+    def slice_time(self, start_time: float, end_time: float) -> "LandmarkSeries":
+        """Returns the part of the series with start_time <= t < end_time."""
+        mask = (self.timestamps >= start_time) & (self.timestamps < end_time)
+        return LandmarkSeries(self.landmarks[mask], self.timestamps[mask], self.frame_indices[mask])
+
+
+def landmarks_to_array(landmarks) -> np.ndarray:
+    """
+    Converts a MediaPipe NormalizedLandmarkList to a (33, 4) float32 array.
+
+    Returns:
+        An array of x, y, z, visibility per landmark; all zeros if `landmarks` is None.
+    """
+    if not landmarks:
+        return np.zeros((NUM_LANDMARKS, LANDMARK_CHANNELS), dtype=np.float32)
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks.landmark], dtype=np.float32)
+
+
+def iter_frame_landmarks(frames: Iterable[VideoFrame],
+                         model_complexity: int = DEFAULT_VIDEO_MODEL_COMPLEXITY
+                         ) -> Iterator[Tuple[VideoFrame, np.ndarray]]:
+    """
+    Runs MediaPipe in tracking mode over a frame stream.
+
+    One tracking-mode estimator is checked out of the shared pool for the whole
+    stream (tracking state carries from frame to frame) and reset when returned.
+
+    Yields:
+        (frame, landmarks) pairs, where landmarks is a (33, 4) float32 array.
+    """
+    with get_pose_pool().estimator(model_complexity, static_image_mode=False) as pose:
+        for frame in frames:
+            with span("pose_tracking"):
+                results = pose.process(frame.image)
+            increment("frames_processed_total")
+            yield frame, landmarks_to_array(results.pose_landmarks)
+
+
+def extract_landmark_series(video_source: VideoSource,
+                            model_complexity: int = DEFAULT_VIDEO_MODEL_COMPLEXITY,
+                            stride: int = 1, target_fps: Optional[float] = None,
+                            max_dimension: Optional[int] = DEFAULT_VIDEO_MAX_DIMENSION,
+                            normalize_lighting: bool = False) -> LandmarkSeries:
+    """
+    Extracts a landmark time-series from a video.
+
+    Args:
+        video_source: A file path, raw bytes, or a binary file-like object.
+        model_complexity: The MediaPipe Pose model complexity.
+        stride: Process every `stride`-th frame.
+        target_fps: If set, subsample to roughly this many frames per second.
+        max_dimension: Downscale frames so the longest side fits before inference.
+        normalize_lighting: Apply CLAHE to each frame first, with the lighting
+            statistics computed once per shot.
+
+    Returns:
+        A LandmarkSeries covering every processed frame.
+    """
+    frames = iter_video_frames(video_source, stride=stride, target_fps=target_fps, max_dimension=max_dimension)
+    if normalize_lighting:
+        frames = normalize_video_frames(frames)
+    landmark_rows, timestamps, frame_indices = [], [], []
+    for frame, landmarks in iter_frame_landmarks(frames, model_complexity):
+        landmark_rows.append(landmarks)
+        timestamps.append(frame.timestamp)
+        frame_indices.append(frame.index)
+
+    if not landmark_rows:
+        return LandmarkSeries(np.zeros((0, NUM_LANDMARKS, LANDMARK_CHANNELS), dtype=np.float32),
+                              np.zeros(0, dtype=np.float64), np.zeros(0, dtype=np.int64))
+    return LandmarkSeries(np.stack(landmark_rows),
+                          np.asarray(timestamps, dtype=np.float64),
+                          np.asarray(frame_indices, dtype=np.int64))
@@ -0,0 +1,348 @@
+"""
+A headless HTTP API for the analysis pipeline, for clients that can't drive the
+Streamlit app (the mobile client, the coaching portal).
+
+Endpoints:
+    GET    /health                 Liveness and queue depths.
+    POST   /v1/analyze/image       Multipart "file" upload; returns the scores.
+    POST   /v1/analyze/video       Multipart "file" upload; returns a job ID (202).
+    GET    /v1/jobs/{job_id}       Progress and detected phases of a video job.
+    DELETE /v1/jobs/{job_id}       Cancels a video job.
+    GET    /metrics                Stage timings and counters in the Prometheus
+                                   text format (empty unless metrics are enabled).
+
+Run it with `python serve.py`. To exercise it without a server or models, pass
+stand-ins to `create_app` and drive it with Starlette's test client:
+
+    from starlette.testclient import TestClient
+    client = TestClient(create_app(analyze_batch=lambda items: [{"status": "no_pose"}] * len(items)))
+    client.post("/v1/analyze/image", files={"file": ("pose.jpg", image_bytes)})
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from .analysis.job_queue import DONE, JobQueue, QueueFullError, get_job_queue
+from .analysis.static_analyzer import DEFAULT_DIVISION, DIVISION_WEIGHTS, analyze_static_pose
+from .preprocessing.image_preprocessor import DEFAULT_QUALITY, preprocess_batch_for_static_analysis
+from .utils.metrics import get_metrics, increment
+from .utils.result_cache import content_key
+
+# Concurrent image submissions are collected for up to this long (or until the
+# batch is full) and then run through background removal and pose detection together.
+DEFAULT_MAX_BATCH_SIZE = 8
+DEFAULT_MAX_BATCH_WAIT_SECONDS = 0.05
+# Image requests beyond this many waiting or in-flight are turned away with a 503.
+DEFAULT_MAX_PENDING_IMAGES = 32
+# Upload size limits, in bytes.
+DEFAULT_MAX_IMAGE_BYTES = 20 * 1024 * 1024
+DEFAULT_MAX_VIDEO_BYTES = 500 * 1024 * 1024
+
+RETRY_AFTER_SECONDS = 2
+
+# One image submission: (encoded image bytes, division)
+ImageRequest = Tuple[bytes, str]
+
+# Analysis errors caused by the upload itself (answered with 422); any other
+# failure is the server's (500), so clients can tell the two apart.
+INVALID_INPUT_ERRORS = (ValueError, UnidentifiedImageError, Image.DecompressionBombError)
+
+
+def _jsonable(value: Any) -> Any:
+    """Converts NumPy scalars and arrays (recursively) to plain Python values."""
+    if isinstance(value, dict):
+        return {k: _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    return value
+
+
+def analyze_image_batch(requests: List[ImageRequest], quality: str = DEFAULT_QUALITY) -> List[Union[dict, Exception]]:
+    """
+    Runs the static analysis on a batch of images with one background-removal
+    batch and concurrent pose detection, at one of the QUALITY_PRESETS.
+
+    Returns:
+        One result dict (or exception) per request, in order. A result has a
+        "status" of "ok" (with "scores") or "no_pose".
+    """
+    increment("image_batches_total")
+    preprocessed = preprocess_batch_for_static_analysis([image_bytes for image_bytes, _ in requests],
+                                                        return_exceptions=True, quality=quality,
+                                                        annotate=False)
+    results = []
+    for (image_bytes, division), item in zip(requests, preprocessed):
+        if isinstance(item, Exception):
+            results.append(item)
+            continue
+        image, pose_landmarks = item
+        if not pose_landmarks:
+            results.append({"status": "no_pose"})
+            continue
+        try:
+            scores = analyze_static_pose(image, pose_landmarks,
+                                         cache_key=content_key(image_bytes, quality), division=division)
+        except Exception as e:
+            results.append(e)
+            continue
+        results.append({"status": "ok", "division": division, "scores": _jsonable(scores)})
+    return results
+
+
+class ImageBatcher:
+    """
+    Collects image submissions from concurrent requests into batches.
+
+    A single background task takes the first waiting submission, gathers more for
+    up to `max_wait_seconds` (or until `max_batch_size`), runs the batch in a
+    thread, and hands each request its own result. The next batch fills while the
+    current one runs.
+    """
+
+    def __init__(self, analyze_batch: Callable[[List[ImageRequest]], List[Union[dict, Exception]]],
+                 max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_seconds: float = DEFAULT_MAX_BATCH_WAIT_SECONDS,
+                 max_pending: int = DEFAULT_MAX_PENDING_IMAGES):
+        self.analyze_batch = analyze_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.max_pending = max_pending
+        self.pending = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, image_bytes: bytes, division: str) -> dict:
+        """
+        Queues one image and waits for its result.
+
+        Raises:
+            QueueFullError: If `max_pending` images are already waiting or running.
+        """
+        if self.pending >= self.max_pending:
+            raise QueueFullError(f"Too many pending images ({self.pending}).")
+        self.pending += 1
+        try:
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put(((image_bytes, division), future))
+            return await future
+        finally:
+            self.pending -= 1
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Requests whose clients went away are dropped before doing any work.
+            batch = [(request, future) for request, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                results = await run_in_threadpool(self.analyze_batch, [request for request, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+# --- Request helpers ---
+
+def _limit_body(request: Request, max_bytes: int) -> Request:
+    """
+    Wraps a request so reading more than `max_bytes` of body fails with a 413,
+    whether or not the client sent a Content-Length.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(413, f"Upload larger than {max_bytes} bytes.")
+
+    received = 0
+
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message["type"] == "http.request":
+            received += len(message.get("body", b""))
+            if received > max_bytes:
+                raise HTTPException(413, f"Upload larger than {max_bytes} bytes.")
+        return message
+
+    return Request(request.scope, receive)
+
+
+async def _read_upload(request: Request, max_bytes: int):
+    """
+    Parses a multipart upload with a single "file" part. The body is streamed
+    through the parser, and the file is spooled to a temporary file on disk once
+    it outgrows a small memory buffer.
+
+    Returns:
+        The parsed form (to be closed by the caller) and its UploadFile.
+    """
+    form = await _limit_body(request, max_bytes).form(max_files=1, max_fields=8)
+    upload = form.get("file")
+    if not isinstance(upload, UploadFile):
+        await form.close()
+        raise HTTPException(400, 'Expected a multipart upload with a "file" field.')
+    return form, upload
+
+
+def _get_division(request: Request) -> str:
+    division = request.query_params.get("division", DEFAULT_DIVISION)
+    if division not in DIVISION_WEIGHTS:
+        raise HTTPException(400, f"Unknown division {division!r}. Expected one of: {', '.join(DIVISION_WEIGHTS)}.")
+    return division
+
+
+def _busy_response(message: str) -> JSONResponse:
+    return JSONResponse({"error": message}, status_code=503, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+
+def _phase_summary(phase: dict) -> dict:
+    """A routine phase without its landmark series."""
+    return _jsonable({key: value for key, value in phase.items() if key != "landmarks"})
+
+
+# --- Application ---
+
+def create_app(analyze_batch: Callable[[List[ImageRequest]], List[Union[dict, Exception]]] = analyze_image_batch,
+               job_queue: Optional[JobQueue] = None,
+               max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+               max_batch_wait_seconds: float = DEFAULT_MAX_BATCH_WAIT_SECONDS,
+               max_pending_images: int = DEFAULT_MAX_PENDING_IMAGES,
+               max_image_bytes: int = DEFAULT_MAX_IMAGE_BYTES,
+               max_video_bytes: int = DEFAULT_MAX_VIDEO_BYTES,
+               quality: str = DEFAULT_QUALITY) -> Starlette:
+    """
+    Builds the ASGI application.
+
+    Args:
+        analyze_batch: Runs a batch of (image bytes, division) submissions; swap in
+            a stand-in to test the service without models.
+        job_queue: Queue for video jobs; defaults to the process-wide one, created
+            on first use.
+        max_batch_size: Most images run through the models together.
+        max_batch_wait_seconds: How long to wait for more images to fill a batch.
+        max_pending_images: Image requests allowed to wait before answering 503.
+        max_image_bytes: Largest accepted image upload.
+        max_video_bytes: Largest accepted video upload.
+        quality: Preprocessing preset for images analyzed by the default analyzer.
+    """
+    if analyze_batch is analyze_image_batch:
+        analyze_batch = partial(analyze_image_batch, quality=quality)
+    batcher = ImageBatcher(analyze_batch, max_batch_size, max_batch_wait_seconds, max_pending_images)
+
+    def _job_queue() -> JobQueue:
+        return job_queue if job_queue is not None else get_job_queue()
+
+    async def health(request: Request) -> JSONResponse:
+        return JSONResponse({"status": "ok", "pending_images": batcher.pending})
+
+    async def metrics(request: Request) -> PlainTextResponse:
+        return PlainTextResponse(get_metrics().prometheus_text(), media_type="text/plain; version=0.0.4")
+
+    async def analyze_image(request: Request) -> JSONResponse:
+        division = _get_division(request)
+        if batcher.pending >= batcher.max_pending:
+            return _busy_response("Too many images waiting for analysis; try again shortly.")
+        form, upload = await _read_upload(request, max_image_bytes)
+        try:
+            image_bytes = await upload.read()
+        finally:
+            await form.close()
+        try:
+            result = await batcher.submit(image_bytes, division)
+        except QueueFullError:
+            return _busy_response("Too many images waiting for analysis; try again shortly.")
+        except Exception as e:
+            status_code = 422 if isinstance(e, INVALID_INPUT_ERRORS) else 500
+            return JSONResponse({"status": "error", "error": f"{type(e).__name__}: {e}"}, status_code=status_code)
+        return JSONResponse(result)
+
+    async def analyze_video(request: Request) -> JSONResponse:
+        form, upload = await _read_upload(request, max_video_bytes)
+        try:
+            # The upload is already on disk; copying it for the worker blocks, so
+            # it runs off the event loop.
+            job_id = await run_in_threadpool(_job_queue().submit_video, upload.file)
+        except QueueFullError:
+            return _busy_response("Too many videos waiting for analysis; try again shortly.")
+        finally:
+            await form.close()
+        return JSONResponse({"job_id": job_id, "status_url": f"/v1/jobs/{job_id}"}, status_code=202)
+
+    async def get_job(request: Request) -> JSONResponse:
+        status = _job_queue().status(request.path_params["job_id"])
+        if status is None:
+            raise HTTPException(404, "Unknown or expired job.")
+        phases = status.result if status.state == DONE else status.partial_results
+        return JSONResponse({
+            "job_id": status.job_id,
+            "state": status.state,
+            "progress": round(status.progress, 3),
+            "message": status.message,
+            "error": status.error,
+            "phases": [_phase_summary(phase) for phase in phases or []],
+        })
+
+    async def cancel_job(request: Request) -> JSONResponse:
+        if not _job_queue().cancel(request.path_params["job_id"]):
+            raise HTTPException(404, "Unknown or already finished job.")
+        return JSONResponse({"job_id": request.path_params["job_id"], "state": "cancelling"}, status_code=202)
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        batcher.start()
+        try:
+            yield
+        finally:
+            await batcher.stop()
+
+    routes = [
+        Route("/health", health, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/v1/analyze/image", analyze_image, methods=["POST"]),
+        Route("/v1/analyze/video", analyze_video, methods=["POST"]),
+        Route("/v1/jobs/{job_id}", get_job, methods=["GET"]),
+        Route("/v1/jobs/{job_id}", cancel_job, methods=["DELETE"]),
+    ]
+    return Starlette(routes=routes, lifespan=lifespan)
@@ -0,0 +1,48 @@
+import importlib
+import sys
+import threading
+import types
+
+
+class _LazyModule(types.ModuleType):
+    """
+    A stand-in for a module that is imported on first attribute access.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_lock"] = threading.Lock()
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with self.__dict__["_lazy_lock"]:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Returns a module that is only really imported when one of its attributes is
+    first used.
+
+    Heavy backends (mediapipe, rembg/onnxruntime, OpenCV, SciPy) take seconds to
+    import, so modules bind them with `cv2 = lazy_import("cv2")` at the top and
+    importing this package stays cheap. If the module is already imported, it is
+    returned as is.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return _LazyModule(name)
+
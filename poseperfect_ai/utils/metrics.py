@@ -0,0 +1,261 @@
+import bisect
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+# Set to 1 to collect metrics in this process, or to "json" to also log every
+# metric event as a JSON line on stderr.
+METRICS_ENV_VAR = "POSEPERFECT_METRICS"
+
+# Upper bounds, in seconds, of the stage latency histogram buckets.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Prefix for every name in the Prometheus exposition.
+PROMETHEUS_NAMESPACE = "poseperfect"
+
+# A metric event passed to exporters: {"type": "span", "name", "seconds"} or
+# {"type": "counter", "name", "value", "labels"}.
+MetricEvent = Dict[str, Any]
+Exporter = Callable[[MetricEvent], None]
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class _SpanStats:
+    def __init__(self):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+
+class MetricsRegistry:
+    """
+    Process-wide stage timings and counters.
+
+    While disabled, spans and counters return immediately without recording
+    anything, so the instrumentation can stay in every pipeline stage. Exporters
+    are called with each event as it is recorded.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._spans: Dict[str, _SpanStats] = {}
+        self._counters: Dict[Tuple[str, LabelSet], float] = {}
+        self._exporters: List[Exporter] = []
+        self._lock = threading.Lock()
+
+    def add_exporter(self, exporter: Exporter) -> None:
+        """Registers a callable that receives every span and counter event."""
+        with self._lock:
+            self._exporters.append(exporter)
+
+    def remove_exporter(self, exporter: Exporter) -> None:
+        with self._lock:
+            self._exporters.remove(exporter)
+
+    def record_span(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._spans.get(name)
+            if stats is None:
+                stats = self._spans[name] = _SpanStats()
+            stats.add(seconds)
+            exporters = list(self._exporters)
+        self._export(exporters, {"type": "span", "name": name, "seconds": seconds})
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """Adds to a counter, keyed by name and labels."""
+        if not self.enabled:
+            return
+        label_set = tuple(sorted(labels.items()))
+        with self._lock:
+            self._counters[(name, label_set)] = self._counters.get((name, label_set), 0) + value
+            exporters = list(self._exporters)
+        self._export(exporters, {"type": "counter", "name": name, "value": value, "labels": labels})
+
+    @staticmethod
+    def _export(exporters: List[Exporter], event: MetricEvent) -> None:
+        for exporter in exporters:
+            try:
+                exporter(event)
+            except Exception as e:
+                # A broken exporter must never fail an analysis.
+                print(f"[WARN] Metrics exporter {exporter!r} failed: {e}", file=sys.stderr)
+
+    def snapshot(self) -> dict:
+        """
+        Returns the current totals.
+
+        Returns:
+            A dictionary with "spans" (a list of dicts with stage, count,
+            total_seconds, mean_ms and max_ms) and "counters" (a list of dicts with
+            name, labels and value).
+        """
+        with self._lock:
+            spans = [{
+                "stage": name,
+                "count": stats.count,
+                "total_seconds": round(stats.total_seconds, 3),
+                "mean_ms": round(stats.total_seconds / stats.count * 1000, 1),
+                "max_ms": round(stats.max_seconds * 1000, 1),
+            } for name, stats in sorted(self._spans.items())]
+            counters = [{"name": name, "labels": dict(label_set), "value": value}
+                        for (name, label_set), value in sorted(self._counters.items())]
+        return {"spans": spans, "counters": counters}
+
+    def reset(self) -> None:
+        """Clears every span and counter (exporters stay registered)."""
+        with self._lock:
+            self._spans.clear()
+            self._counters.clear()
+
+    def prometheus_text(self) -> str:
+        """
+        Renders the metrics in the Prometheus text exposition format: one latency
+        histogram labelled by stage, and one counter per counter name.
+        """
+        histogram = f"{PROMETHEUS_NAMESPACE}_stage_seconds"
+        lines = [f"# HELP {histogram} Time spent in each pipeline stage.", f"# TYPE {histogram} histogram"]
+        with self._lock:
+            for name, stats in sorted(self._spans.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), stats.bucket_counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{histogram}_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{histogram}_sum{{stage="{name}"}} {stats.total_seconds:.6f}')
+                lines.append(f'{histogram}_count{{stage="{name}"}} {stats.count}')
+
+            typed = set()
+            for (name, label_set), value in sorted(self._counters.items()):
+                metric = f"{PROMETHEUS_NAMESPACE}_{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                labels = ",".join(f'{key}="{label}"' for key, label in label_set)
+                lines.append(f"{metric}{{{labels}}} {value:g}" if labels else f"{metric} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class JsonLogExporter:
+    """Writes each metric event as one JSON line, e.g. for a log shipper."""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream
+
+    def __call__(self, event: MetricEvent) -> None:
+        record = dict(event, timestamp=round(time.time(), 3))
+        print(json.dumps(record), file=self.stream or sys.stderr, flush=True)
+
+
+def _registry_from_env() -> MetricsRegistry:
+    setting = os.environ.get(METRICS_ENV_VAR, "").strip().lower()
+    registry = MetricsRegistry(enabled=setting not in ("", "0", "false", "no"))
+    if setting == "json":
+        registry.add_exporter(JsonLogExporter())
+    return registry
+
+
+_registry = _registry_from_env()
+
+# The per-task span collector (see `collect_spans`), if one is active.
+_collector: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "poseperfect_span_collector", default=None)
+
+_NULL_SPAN = nullcontext()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Returns the process-wide metrics registry."""
+    return _registry
+
+
+def enable_metrics(enabled: bool = True) -> MetricsRegistry:
+    """Turns metric collection on (or off) for this process."""
+    _registry.enabled = enabled
+    return _registry
+
+
+@contextmanager
+def _timed_span(name: str, collector: Optional[List[Tuple[str, float]]]) -> Iterator[None]:
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start_time
+        if collector is not None:
+            collector.append((name, seconds))
+        if _registry.enabled:
+            _registry.record_span(name, seconds)
+
+
+def span(name: str):
+    """
+    Times a block as one pipeline stage:
+
+        with span("rembg"):
+            mask = remover.remove(image, only_mask=True)
+
+    A shared no-op context is returned when metrics are disabled and no
+    `collect_spans` block is active.
+    """
+    collector = _collector.get()
+    if not _registry.enabled and collector is None:
+        return _NULL_SPAN
+    return _timed_span(name, collector)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Decorator form of `span`, timing every call of the function."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            collector = _collector.get()
+            if not _registry.enabled and collector is None:
+                return fn(*args, **kwargs)
+            with _timed_span(name, collector):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def increment(name: str, value: float = 1, **labels: str) -> None:
+    """Adds to a process-wide counter (a no-op while metrics are disabled)."""
+    if _registry.enabled:
+        _registry.increment(name, value, **labels)
+
+
+@contextmanager
+def collect_spans() -> Iterator[List[Tuple[str, float]]]:
+    """
+    Collects the spans recorded in this thread (or asyncio task) during the block,
+    whether or not process-wide metrics are enabled, as (stage, seconds) pairs.
+    Used to attach a per-analysis stage breakdown to a result.
+    """
+    spans: List[Tuple[str, float]] = []
+    token = _collector.set(spans)
+    try:
+        yield spans
+    finally:
+        _collector.reset(token)
+
+
+def summarize_spans(spans: List[Tuple[str, float]]) -> List[dict]:
+    """Totals collected spans per stage, in first-seen order."""
+    totals: Dict[str, List[float]] = {}
+    for name, seconds in spans:
+        totals.setdefault(name, []).append(seconds)
+    return [{"stage": name, "calls": len(times), "seconds": round(sum(times), 3)}
+            for name, times in totals.items()]
@@ -0,0 +1,79 @@
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class WorkerCrashedError(RuntimeError):
+    """
+    Raised by `imap_bounded` when a worker process dies (e.g. a native crash or the
+    OOM killer), which breaks the pool and loses every task still in flight.
+    """
+
+    def __init__(self, lost_items: List[Any]):
+        super().__init__(f"A worker process died; {len(lost_items)} in-flight task(s) were lost.")
+        self.lost_items = lost_items
+
+
+def _set_onnx_threads(onnx_threads: Optional[int]) -> None:
+    """
+    Process-pool initializer: caps onnxruntime's threads per worker so N workers
+    don't each spin up a thread per core. Must run before any session is created.
+    """
+    if onnx_threads:
+        os.environ.setdefault("OMP_NUM_THREADS", str(onnx_threads))
+
+
+def create_process_pool(workers: int, initializer: Optional[Callable] = None,
+                        initargs: Tuple = ()) -> ProcessPoolExecutor:
+    """
+    Creates a process pool suited to the model-heavy pipelines in this package.
+
+    Workers are spawned rather than forked: forking after onnxruntime or
+    mediapipe have started their thread pools can deadlock the children. Unless a
+    custom initializer is given, each worker's onnxruntime threads are capped to
+    its share of the CPUs.
+    """
+    if initializer is None:
+        initializer = _set_onnx_threads
+        initargs = (max(1, (os.cpu_count() or 1) // max(workers, 1)),)
+    return ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs,
+                               mp_context=multiprocessing.get_context("spawn"))
+
+
+def imap_bounded(executor: Executor, fn: Callable[..., Any], items: Iterable[Any],
+                 max_in_flight: int) -> Iterator[Any]:
+    """
+    Maps `fn` over `items` on an executor, yielding results as they complete.
+
+    Unlike `Executor.map`, at most `max_in_flight` tasks are submitted at once, so
+    a huge input list never turns into a huge queue of pending tasks (and their
+    pickled arguments) in memory.
+
+    If a worker process dies, WorkerCrashedError is raised with the items that were
+    in flight. Items not yet submitted stay in `items` when it is an iterator, so
+    the caller can carry on with them on a new pool.
+    """
+    remaining = iter(items)
+    in_flight: Dict[Future, Any] = {}
+    while True:
+        for item in remaining:
+            try:
+                in_flight[executor.submit(fn, item)] = item
+            except BrokenProcessPool:
+                raise WorkerCrashedError([item, *in_flight.values()]) from None
+            if len(in_flight) >= max_in_flight:
+                break
+        if not in_flight:
+            return
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        lost = []
+        for future in done:
+            item = in_flight.pop(future)
+            if isinstance(future.exception(), BrokenProcessPool):
+                lost.append(item)
+            else:
+                yield future.result()
+        if lost:
+            raise WorkerCrashedError(lost + list(in_flight.values()))
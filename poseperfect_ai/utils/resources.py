@@ -0,0 +1,216 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# A resource's memory: a fixed byte count, or a callable that reports it from the
+# resource itself (for resources that keep allocating after they are loaded).
+SizeSpec = Union[int, Callable[[Any], int]]
+
+# Environment variable that caps the memory of unpinned resources, in megabytes.
+MEMORY_BUDGET_ENV_VAR = "POSEPERFECT_MODEL_MEMORY_MB"
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (0 where it can't be read)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+class _Resource:
+    def __init__(self, key: str, closer: Optional[Callable[[Any], None]], pinned: bool):
+        self.key = key
+        self.closer = closer
+        self.pinned = pinned
+        self.value = None
+        self.loaded = False
+        self.size_bytes = 0
+        self.size_fn: Optional[Callable[[Any], int]] = None
+        self.load_seconds = 0.0
+        self.hits = 0
+        self.last_used = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def current_size(self) -> int:
+        return self.size_fn(self.value) if self.size_fn is not None else self.size_bytes
+
+
+class ResourceManager:
+    """
+    Owns long-lived model resources (the rembg session, the pose estimator pool,
+    per-division Anatomist models) for the lifetime of the process.
+
+    Each resource is loaded at most once, even when several threads (Streamlit
+    sessions) ask for it at the same time, and then shared. Memory is accounted
+    per resource: as given, as reported by the resource, or as the RSS growth
+    while it loaded. Measured growth is approximate: loads running at the same
+    time are counted in each other's figures. When the total exceeds the budget,
+    the least recently used unpinned resources are evicted (and closed) until it
+    fits again.
+    """
+
+    def __init__(self, memory_budget_bytes: Optional[int] = None):
+        self.memory_budget_bytes = memory_budget_bytes
+        self._resources: Dict[str, _Resource] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, factory: Callable[[], Any], size_bytes: Optional[SizeSpec] = None,
+            closer: Optional[Callable[[Any], None]] = None, pinned: bool = False) -> Any:
+        """
+        Returns the resource stored under `key`, loading it with `factory` on first use.
+
+        Args:
+            key: Unique name of the resource, e.g. "anatomist:Men's Physique".
+            factory: Zero-argument callable that loads the resource.
+            size_bytes: Memory used by the resource, or a callable that returns it
+                from the loaded resource; measured as RSS growth if not given.
+            closer: Called with the resource when it is evicted.
+            pinned: Pinned resources count toward memory but are never evicted.
+        """
+        while True:
+            with self._lock:
+                resource = self._resources.get(key)
+                if resource is None:
+                    resource = self._resources[key] = _Resource(key, closer, pinned)
+
+            # Load outside the manager lock so slow loads don't block other resources.
+            with resource.lock:
+                with self._lock:
+                    current = self._resources.get(key)
+                if current is not resource:
+                    # Evicted while we waited for its lock; loading into it would
+                    # leave an orphan the manager never accounts or evicts.
+                    continue
+                if not resource.loaded:
+                    rss_before = current_rss()
+                    start_time = time.perf_counter()
+                    resource.value = factory()
+                    resource.load_seconds = time.perf_counter() - start_time
+                    if callable(size_bytes):
+                        resource.size_fn = size_bytes
+                    elif size_bytes is not None:
+                        resource.size_bytes = size_bytes
+                    else:
+                        resource.size_bytes = max(current_rss() - rss_before, 0)
+                    resource.loaded = True
+                else:
+                    resource.hits += 1
+                resource.last_used = time.monotonic()
+                value = resource.value
+            break
+
+        self._enforce_budget(keep=key)
+        return value
+
+    def evict(self, key: str) -> bool:
+        """
+        Drops a resource (pinned or not) and closes it. Returns False if not loaded.
+        """
+        with self._lock:
+            resource = self._resources.pop(key, None)
+        if resource is None:
+            return False
+        with resource.lock:
+            was_loaded = resource.loaded
+            if was_loaded and resource.closer is not None:
+                resource.closer(resource.value)
+            resource.value = None
+            resource.loaded = False
+        return was_loaded
+
+    def clear(self) -> None:
+        """Evicts every resource."""
+        with self._lock:
+            keys = list(self._resources)
+        for key in keys:
+            self.evict(key)
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(r.current_size for r in self._resources.values() if r.loaded)
+
+    def stats(self) -> List[dict]:
+        """
+        Per-resource accounting, most recently used first.
+        """
+        with self._lock:
+            resources = [r for r in self._resources.values() if r.loaded]
+        resources.sort(key=lambda r: r.last_used, reverse=True)
+        return [{
+            "resource": r.key,
+            "size_mb": round(r.current_size / (1024 * 1024), 1),
+            "load_seconds": round(r.load_seconds, 2),
+            "hits": r.hits,
+            "pinned": r.pinned,
+        } for r in resources]
+
+    def _enforce_budget(self, keep: str) -> None:
+        if self.memory_budget_bytes is None:
+            return
+        while self.total_bytes > self.memory_budget_bytes:
+            with self._lock:
+                candidates = [r for r in self._resources.values()
+                              if r.loaded and not r.pinned and r.key != keep]
+            if not candidates:
+                return
+            self.evict(min(candidates, key=lambda r: r.last_used).key)
+
+
+# --- Process-wide shared manager ---
+
+_shared_manager: Optional[ResourceManager] = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_resource_manager() -> ResourceManager:
+    """
+    Returns the process-wide resource manager. Its budget for unpinned resources
+    comes from the POSEPERFECT_MODEL_MEMORY_MB environment variable (no limit if unset).
+    """
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            budget_mb = os.environ.get(MEMORY_BUDGET_ENV_VAR)
+            _shared_manager = ResourceManager(int(float(budget_mb) * 1024 * 1024) if budget_mb else None)
+        return _shared_manager
+
+
+def cache_resource(pinned: bool = False, closer: Optional[Callable[[Any], None]] = None,
+                   size_bytes: Optional[SizeSpec] = None):
+    """
+    Decorator with `st.cache_resource` semantics that works outside Streamlit:
+    the function runs once per distinct set of arguments for the life of the
+    process, and its result is shared by every caller and thread.
+
+    Results live in the shared ResourceManager, so they are memory-accounted and
+    (unless pinned) evictable. The decorated function gains a `clear()` method
+    that evicts all of its cached results.
+    """
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        prefix = f"{fn.__module__}.{fn.__qualname__}"
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            # Bind defaults so f() and f(default_value) share one resource.
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = prefix + repr(tuple(bound.arguments.values()))
+            return get_resource_manager().get(key, lambda: fn(*args, **kwargs), size_bytes, closer, pinned)
+
+        def clear() -> None:
+            manager = get_resource_manager()
+            for entry in manager.stats():
+                if entry["resource"].startswith(prefix + "("):
+                    manager.evict(entry["resource"])
+
+        wrapper.clear = clear
+        return wrapper
+    return decorator
@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from .lazy import lazy_import
+from .metrics import increment
+
+cv2 = lazy_import("cv2")
+
+DEFAULT_MAX_ENTRIES = 64
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Environment variable that enables the on-disk tier of the shared cache.
+CACHE_DIR_ENV_VAR = "POSEPERFECT_CACHE_DIR"
+
+# A cache entry is a flat dict of field name -> ndarray, bytes, None, or JSON-able value.
+CacheEntry = Dict[str, Any]
+
+
+def content_key(data: bytes, *params: Any) -> str:
+    """
+    Builds a cache key from the content of an upload plus any parameters that
+    change the result (model complexity, division, ...).
+    """
+    digest = hashlib.sha256(data)
+    for param in params:
+        digest.update(b"\0" + repr(param).encode())
+    return digest.hexdigest()
+
+
+def _entry_size(entry: CacheEntry) -> int:
+    """Approximate in-memory size of an entry, in bytes."""
+    size = 0
+    for value in entry.values():
+        if isinstance(value, np.ndarray):
+            size += value.nbytes
+        elif isinstance(value, bytes):
+            size += len(value)
+        else:
+            size += 64
+    return size
+
+
+def _frozen_copy(array: np.ndarray) -> np.ndarray:
+    copy = array.copy()
+    copy.flags.writeable = False
+    return copy
+
+
+class ResultCache:
+    """
+    A content-addressed, two-tier cache for analysis results.
+
+    The memory tier is an LRU bounded by both entry count and total bytes. The
+    optional disk tier stores each entry as one compressed `.npz` file (RGB images
+    are PNG-encoded), so results survive app restarts; disk hits are promoted back
+    into memory.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                 cache_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        """
+        Looks up an entry, checking memory first and then disk.
+
+        Returns:
+            The cached entry, or None on a miss. Its arrays are shared with other
+            callers and read-only; copy them before modifying.
+        """
+        full_key = f"{namespace}/{key}"
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None:
+                self._entries.move_to_end(full_key)
+                increment("cache_requests_total", namespace=namespace, result="memory_hit")
+                return entry
+        if not self.cache_dir:
+            increment("cache_requests_total", namespace=namespace, result="miss")
+            return None
+        entry = self._read_disk(namespace, key)
+        if entry is not None:
+            self._put_memory(full_key, entry)
+        increment("cache_requests_total", namespace=namespace, result="miss" if entry is None else "disk_hit")
+        return entry
+
+    def put(self, namespace: str, key: str, entry: CacheEntry) -> None:
+        """
+        Stores an entry in memory and, if enabled, on disk. Arrays are stored as
+        read-only copies, so neither the caller nor later readers can corrupt the
+        cached result, and the caller's own arrays stay writable.
+        """
+        entry = {name: _frozen_copy(value) if isinstance(value, np.ndarray) else value
+                 for name, value in entry.items()}
+        self._put_memory(f"{namespace}/{key}", entry)
+        if self.cache_dir:
+            self._write_disk(namespace, key, entry)
+
+    def clear(self) -> None:
+        """Empties the memory tier. Files on disk are left in place."""
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._total_bytes = 0
+
+    def _put_memory(self, full_key: str, entry: CacheEntry) -> None:
+        size = _entry_size(entry)
+        with self._lock:
+            if full_key in self._entries:
+                self._total_bytes -= self._sizes.pop(full_key)
+                del self._entries[full_key]
+            self._entries[full_key] = entry
+            self._sizes[full_key] = size
+            self._total_bytes += size
+            # Evict least recently used entries, but always keep the newest one.
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries
+                                              or self._total_bytes > self.max_bytes):
+                old_key, _ = self._entries.popitem(last=False)
+                self._total_bytes -= self._sizes.pop(old_key)
+
+    # --- Disk tier ---
+
+    def _disk_path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.cache_dir, namespace, f"{key}.npz")
+
+    def _write_disk(self, namespace: str, key: str, entry: CacheEntry) -> None:
+        arrays = {}
+        for name, value in entry.items():
+            if isinstance(value, np.ndarray) and value.dtype == np.uint8 and value.ndim == 3 and value.shape[2] == 3:
+                ok, encoded = cv2.imencode(".png", cv2.cvtColor(value, cv2.COLOR_RGB2BGR))
+                if not ok:
+                    return
+                arrays[f"{name}.png"] = encoded
+            elif isinstance(value, np.ndarray):
+                arrays[f"{name}.npy"] = value
+            elif isinstance(value, bytes):
+                arrays[f"{name}.bytes"] = np.frombuffer(value, dtype=np.uint8)
+            elif value is None:
+                arrays[f"{name}.none"] = np.zeros(0, dtype=np.uint8)
+            else:
+                arrays[f"{name}.json"] = np.frombuffer(json.dumps(value).encode(), dtype=np.uint8)
+
+        path = self._disk_path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file and rename so a crash never leaves a torn entry.
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                np.savez_compressed(f, **arrays)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _read_disk(self, namespace: str, key: str) -> Optional[CacheEntry]:
+        path = self._disk_path(namespace, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            entry = {}
+            with np.load(path) as data:
+                for stored_name in data.files:
+                    name, kind = stored_name.rsplit(".", 1)
+                    value = data[stored_name]
+                    if kind == "png":
+                        decoded = cv2.imdecode(value, cv2.IMREAD_COLOR)
+                        if decoded is None:
+                            raise ValueError(f"Corrupt PNG in cache entry {path}")
+                        entry[name] = cv2.cvtColor(decoded, cv2.COLOR_BGR2RGB)
+                        entry[name].flags.writeable = False
+                    elif kind == "npy":
+                        value.flags.writeable = False
+                        entry[name] = value
+                    elif kind == "bytes":
+                        entry[name] = value.tobytes()
+                    elif kind == "none":
+                        entry[name] = None
+                    else:
+                        entry[name] = json.loads(value.tobytes().decode())
+            return entry
+        except Exception:
+            # Unreadable or corrupt entry (e.g. a truncated zip or an undecodable
+            # PNG): remove it and treat it as a miss, so it is rewritten.
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+
+# --- Process-wide shared cache ---
+
+_shared_cache: Optional[ResultCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """
+    Returns the process-wide result cache. The disk tier is enabled when the
+    POSEPERFECT_CACHE_DIR environment variable is set.
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResultCache(cache_dir=os.environ.get(CACHE_DIR_ENV_VAR) or None)
+        return _shared_cache
+
+
+def configure_result_cache(max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES,
+                           cache_dir: Optional[str] = None) -> ResultCache:
+    """
+    Replaces the shared cache with one using the given bounds and disk directory.
+    """
+    global _shared_cache
+    with _shared_cache_lock:
+        _shared_cache = ResultCache(max_entries, max_bytes, cache_dir)
+        return _shared_cache
@@ -0,0 +1,51 @@
+import os
+import argparse
+
+# To make this script runnable from the root directory, we add the project path.
+import sys
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+
+import uvicorn
+
+from poseperfect_ai.analysis.job_queue import DEFAULT_MAX_WORKERS, JobQueue
+from poseperfect_ai.preload import preload_backends
+from poseperfect_ai.preprocessing.image_preprocessor import DEFAULT_QUALITY, QUALITY_PRESETS
+from poseperfect_ai.service import (
+    DEFAULT_MAX_BATCH_SIZE,
+    DEFAULT_MAX_BATCH_WAIT_SECONDS,
+    DEFAULT_MAX_PENDING_IMAGES,
+    create_app,
+)
+from poseperfect_ai.utils.metrics import JsonLogExporter, enable_metrics
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the PosePerfect analyzers over HTTP.")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on.")
+    parser.add_argument("--video_workers", type=int, default=DEFAULT_MAX_WORKERS, help="Worker processes for video jobs (caps concurrent videos).")
+    parser.add_argument("--max_batch_size", type=int, default=DEFAULT_MAX_BATCH_SIZE, help="Most concurrent images run through the models together.")
+    parser.add_argument("--max_batch_wait_ms", type=float, default=DEFAULT_MAX_BATCH_WAIT_SECONDS * 1000, help="How long to wait for more images to fill a batch.")
+    parser.add_argument("--max_pending_images", type=int, default=DEFAULT_MAX_PENDING_IMAGES, help="Image requests allowed to wait before answering 503.")
+    parser.add_argument("--quality", type=str, default=DEFAULT_QUALITY, choices=list(QUALITY_PRESETS), help="Working resolution and pose model size for images (fast, balanced or full).")
+    parser.add_argument("--metrics", action="store_true", help="Collect per-stage timings and counters for image requests, served at /metrics.")
+    parser.add_argument("--metrics_log", action="store_true", help="Also log every metric event as a JSON line on stderr (implies --metrics).")
+
+    args = parser.parse_args()
+
+    if args.metrics or args.metrics_log:
+        metrics = enable_metrics()
+        if args.metrics_log:
+            metrics.add_exporter(JsonLogExporter())
+
+    # Image requests run in this process; load the models before taking traffic.
+    print("Loading models...")
+    preload_backends(warm_up_models=True, background=False)
+
+    job_queue = JobQueue(args.video_workers, warm_up_models=True)
+    app = create_app(job_queue=job_queue, max_batch_size=args.max_batch_size,
+                     max_batch_wait_seconds=args.max_batch_wait_ms / 1000,
+                     max_pending_images=args.max_pending_images, quality=args.quality)
+    try:
+        uvicorn.run(app, host=args.host, port=args.port)
+    finally:
+        job_queue.shutdown()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Make the package importable when the tests are run from any directory.
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
@@ -0,0 +1,47 @@
+import io
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from poseperfect_ai.preprocessing import image_preprocessor
+from poseperfect_ai.preprocessing.image_preprocessor import preprocess_batch_for_static_analysis
+from poseperfect_ai.utils.metrics import collect_spans
+
+
+class _StubRemover:
+    """Keeps the whole frame as foreground, without loading rembg."""
+
+    def remove_batch(self, images, return_exceptions=False, only_mask=False):
+        return [Image.new("L", image.size, 255) for image in images]
+
+
+class _StubPosePool:
+    """Two estimators that never find a pose, without loading MediaPipe."""
+
+    size = 2
+
+    @contextmanager
+    def estimator(self, model_complexity):
+        yield SimpleNamespace(process=lambda image: SimpleNamespace(pose_landmarks=None))
+
+
+@pytest.fixture
+def photos():
+    buffer = io.BytesIO()
+    Image.fromarray(np.random.default_rng(0).integers(0, 256, (240, 180, 3), dtype=np.uint8)).save(buffer, "JPEG")
+    return [buffer.getvalue()] * 2
+
+
+def test_batch_timings_include_the_worker_thread_stages(monkeypatch, photos):
+    monkeypatch.setattr(image_preprocessor, "get_background_remover", lambda: _StubRemover())
+    monkeypatch.setattr(image_preprocessor, "get_pose_pool", lambda: _StubPosePool())
+
+    with collect_spans() as spans:
+        preprocess_batch_for_static_analysis(photos, use_cache=False, annotate=False)
+
+    recorded = {name for name, _ in spans}
+    for stage in ("background_removal", "crop_and_mask", "lighting", "pose_detection"):
+        assert stage in recorded
@@ -0,0 +1,25 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import create_dataset
+
+
+def _crash_on_marked_batch(input_dir, output_dir, filenames):
+    if "crash.jpg" in filenames:
+        os._exit(1)
+    return [(filename, "digest", None) for filename in filenames]
+
+
+def test_batches_after_a_worker_crash_run_on_a_fresh_pool(monkeypatch):
+    monkeypatch.setattr(create_dataset, "_process_batch", _crash_on_marked_batch)
+    monkeypatch.setattr(create_dataset, "create_process_pool",
+                        lambda workers, initializer, initargs: ProcessPoolExecutor(workers))
+    batches = [["a.jpg"], ["crash.jpg"], ["b.jpg"]]
+
+    results = [row for batch in create_dataset._run_batches("in", "out", batches, workers=2, max_in_flight=1)
+               for row in batch]
+
+    errors = {filename: error for filename, _, error in results}
+    assert set(errors) == {"a.jpg", "crash.jpg", "b.jpg"}
+    assert errors["a.jpg"] is None and errors["b.jpg"] is None
+    assert "BrokenProcessPool" in errors["crash.jpg"]
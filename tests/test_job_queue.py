@@ -0,0 +1,53 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from poseperfect_ai.analysis.job_queue import DONE, FAILED, JobQueue
+
+JOB_TIMEOUT_SECONDS = 120
+
+
+def _crash_worker(job_id):
+    os._exit(1)  # Dies like an OOM kill or a native segfault would
+
+
+def _echo(job_id, value):
+    return value
+
+
+class _BrokenExecutor:
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly.")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+@pytest.fixture
+def queue():
+    job_queue = JobQueue(max_workers=1, max_pending=4)
+    yield job_queue
+    job_queue.shutdown()
+
+
+def test_queue_keeps_taking_jobs_after_a_worker_dies(queue):
+    crashed = queue.wait(queue.submit("test", _crash_worker), timeout=JOB_TIMEOUT_SECONDS)
+    assert crashed.state == FAILED
+    assert "BrokenProcessPool" in crashed.error
+
+    job_ids = [queue.submit("test", _echo, i) for i in range(3)]
+    queue.cancel(job_ids[-1])
+    for i, job_id in enumerate(job_ids[:2]):
+        status = queue.wait(job_id, timeout=JOB_TIMEOUT_SECONDS)
+        assert status.state == DONE
+        assert status.result == i
+
+
+def test_submit_to_a_broken_pool_retries_on_a_fresh_one(queue):
+    queue._executor = _BrokenExecutor()
+
+    job_id = queue.submit("test", _echo, "ok")
+
+    assert queue.wait(job_id, timeout=JOB_TIMEOUT_SECONDS).result == "ok"
+    assert [job.job_id for job in queue.jobs()] == [job_id]
@@ -0,0 +1,36 @@
+import cv2
+import numpy as np
+
+from poseperfect_ai.preprocessing.lighting import CLAHE_CLIP_LIMIT, CLAHE_TILE_GRID_SIZE, LightingNormalizer
+
+
+def _reference_clahe(image: np.ndarray) -> np.ndarray:
+    lab_image = cv2.cvtColor(image, cv2.COLOR_RGB2LAB)
+    clahe = cv2.createCLAHE(clipLimit=CLAHE_CLIP_LIMIT, tileGridSize=CLAHE_TILE_GRID_SIZE)
+    lab_image[..., 0] = clahe.apply(np.ascontiguousarray(lab_image[..., 0]))
+    return cv2.cvtColor(lab_image, cv2.COLOR_LAB2RGB)
+
+
+def _photo(height: int, width: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(30, 220, width, dtype=np.float32)[None, :, None]
+    noise = rng.normal(0, 12, (height, width, 3))
+    return np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
+
+def test_stills_match_opencv_clahe_exactly():
+    # 1501 x 2003 is not a multiple of the 8 x 8 tile grid.
+    image = _photo(1501, 2003)
+
+    normalized = LightingNormalizer().normalize(image)
+
+    np.testing.assert_array_equal(normalized, _reference_clahe(image))
+
+
+def test_banded_path_stays_close_to_opencv_clahe():
+    image = _photo(1501, 2003)
+
+    banded = LightingNormalizer(max_unbanded_pixels=0).normalize(image)
+
+    difference = np.abs(banded.astype(np.int16) - _reference_clahe(image))
+    assert difference.mean() < 1.0
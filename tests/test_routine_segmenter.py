@@ -0,0 +1,42 @@
+import numpy as np
+
+from poseperfect_ai.analysis.dynamic_analyzer import RoutineSegmenter
+from poseperfect_ai.analysis.static_analyzer import LEFT_HIP, LEFT_SHOULDER, RIGHT_HIP, RIGHT_SHOULDER
+
+FPS = 15
+
+
+def _pose(x_offset=0.0):
+    landmarks = np.zeros((33, 4))
+    landmarks[:, 0] = np.linspace(0.4, 0.6, 33) + x_offset
+    landmarks[:, 1] = np.linspace(0.1, 0.9, 33)
+    landmarks[:, 3] = 1.0
+    landmarks[[LEFT_SHOULDER, RIGHT_SHOULDER], 1] = 0.3
+    landmarks[[LEFT_HIP, RIGHT_HIP], 1] = 0.6
+    return landmarks
+
+
+def _segment(frames):
+    segmenter = RoutineSegmenter()
+    phases = []
+    for index, landmarks in enumerate(frames):
+        phases.extend(segmenter.update(index / FPS, landmarks, index))
+    phases.extend(segmenter.finish())
+    return phases
+
+
+def test_clip_that_opens_on_a_hold_starts_with_the_hold():
+    still = [_pose()] * (2 * FPS)
+    moving = [_pose(0.2 * np.sin(i / 2)) for i in range(2 * FPS)]
+    phases = _segment(still + moving)
+
+    assert phases[0]["type"] == "Held Pose"
+    assert phases[0]["start_time"] == 0.0
+    assert phases[1]["type"] == "Transition"
+
+
+def test_clip_that_is_one_hold_is_a_single_phase():
+    phases = _segment([_pose()] * (2 * FPS))
+
+    assert [phase["type"] for phase in phases] == ["Held Pose"]
+    assert len(phases[0]["landmarks"]) == 2 * FPS
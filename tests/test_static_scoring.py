@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from poseperfect_ai.analysis.static_analyzer import (
+    DIVISION_WEIGHTS,
+    calculate_total_package_score,
+    calculate_total_package_scores,
+)
+
+
+@pytest.mark.parametrize("division", list(DIVISION_WEIGHTS))
+def test_scalar_total_score_matches_the_vector_kernel(division):
+    scores = np.random.default_rng(0).integers(0, 101, (2000, 3))
+    scores = np.concatenate([scores, [[0, 0, 0], [100, 100, 100], [80, 80, 80], [100, 0, 50]]])
+
+    expected = calculate_total_package_scores(scores[:, 0], scores[:, 1], scores[:, 2], division)
+    actual = [calculate_total_package_score(*(int(s) for s in row), division) for row in scores]
+
+    assert actual == expected.tolist()
+
+
+def test_scalar_total_score_rejects_an_unknown_division():
+    with pytest.raises(ValueError):
+        calculate_total_package_score(80, 80, 80, "Powerlifting")